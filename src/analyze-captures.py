@@ -0,0 +1,45 @@
+# Batch analysis of logged captures: statistics, dominant period, spikes and their repetition period, histograms.
+# Many files are analysed in parallel across a process pool; results are printed as a table and can be
+# written as JSON (--output), histograms included.
+import argparse  # Import argparse for the analysis options
+import glob  # Import glob for expanding file patterns (e.g. on Windows shells that don't)
+import json  # Import json for machine-readable results
+import time  # Import time module for timing the batch
+from dmm6500_analysis import HISTOGRAM_BINS, SPIKE_THRESHOLD, SPIKE_WINDOW, analyze_files
+
+# Main function
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Analyse logged DMM6500 captures (CSV, Parquet, HDF5, memmap or segmented).')
+    parser.add_argument('files', nargs='+', help='capture files or patterns, e.g. logs/*.csv')
+    parser.add_argument('-w', '--workers', type=int, help='worker processes (default: one per CPU)')
+    parser.add_argument('--threshold', type=float, default=SPIKE_THRESHOLD,
+                        help=f'robust z-score above which a reading is a spike (default {SPIKE_THRESHOLD:g})')
+    parser.add_argument('--window', type=int, default=SPIKE_WINDOW,
+                        help=f'readings a reading is compared with, itself included; odd, and more than twice as wide as '
+                             f'the spikes (default {SPIKE_WINDOW})')
+    parser.add_argument('--bins', type=int, default=HISTOGRAM_BINS, help=f'histogram bins (default {HISTOGRAM_BINS})')
+    parser.add_argument('-o', '--output', help='write the full results as JSON to this file')
+    args = parser.parse_args()
+
+    filenames = [name for pattern in args.files for name in (sorted(glob.glob(pattern)) or [pattern])]
+    start = time.perf_counter()
+    if args.window < 3 or args.window % 2 == 0:
+        parser.error('the spike window must be odd and at least 3')
+    results = analyze_files(filenames, args.workers, args.threshold, args.bins, args.window)
+    elapsed = time.perf_counter() - start
+
+    print(f"{'file':<32} {'count':>9} {'mean':>11} {'std':>11} {'min':>11} {'max':>11} {'period s':>9} {'spikes':>7} {'every s':>8}")
+    for result in results:
+        s = result['summary']
+        if not s['count']:
+            print(f"{result['file']:<32} {0:>9}")
+            continue
+        period = f"{result['period']:.3g}" if result['period'] else '-'
+        spike_period = f"{result['spike_period']:.3g}" if result['spike_period'] else '-'
+        print(f"{result['file']:<32} {s['count']:>9} {s['mean']:>11.6g} {s['std']:>11.4g} {s['min']:>11.6g} "
+              f"{s['max']:>11.6g} {period:>9} {len(result['spikes']):>7} {spike_period:>8}")
+    print(f"{len(results)} files, {sum(r['summary']['count'] for r in results)} readings in {elapsed:.2f} s")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
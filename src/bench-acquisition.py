@@ -0,0 +1,142 @@
+# Throughput and latency benchmarks for the acquisition path, run against the simulated DMM6500.
+# Latencies are per operation (one query, one parse, one buffer chunk); throughput is in readings per second.
+# Results are printed as a table and can be written as JSON (--output) to compare between releases.
+import argparse  # Import argparse for the benchmark options
+import csv  # Import CSV module for the legacy per-row writer
+import json  # Import json for machine-readable results
+import os  # Import os for temporary files
+import platform  # Import platform for recording the benchmark machine
+import tempfile  # Import tempfile for scratch output files
+import time  # Import time module for timing
+import numpy as np  # Import NumPy for percentiles and binary decoding
+from dmm6500_scpi import all_query_templates, compiled_commands, do_query, query_text, _parse_buffer_data
+from dmm6500_acquisition import burst_readings
+from dmm6500_writer import SINKS, format_timestamp, open_sink, sink_filename
+from dmm6500_sim import SimulatedDMM6500
+
+# Function to summarize per-operation latencies (in seconds) as a result record; items_per_op may also give the
+# items of every operation (e.g. the readings of each burst chunk)
+def latency_result(name, category, latencies, items_per_op=1):
+    latencies = np.asarray(latencies)
+    total = latencies.sum()
+    items = np.sum(np.broadcast_to(items_per_op, latencies.shape))
+    return {
+        'name': name,
+        'category': category,
+        'ops': len(latencies),
+        'items_per_s': items / total if total > 0 else float('inf'),
+        'mean_us': latencies.mean() * 1e6,
+        'p50_us': np.percentile(latencies, 50) * 1e6,
+        'p90_us': np.percentile(latencies, 90) * 1e6,
+        'p99_us': np.percentile(latencies, 99) * 1e6,
+    }
+
+# Function to time a callable once per iteration
+def time_calls(func, iterations):
+    latencies = np.empty(iterations)
+    for i in range(iterations):
+        start = time.perf_counter()
+        func()
+        latencies[i] = time.perf_counter() - start
+    return latencies
+
+# Instrument round trip: raw :MEAS? queries against the simulator with its latency model enabled
+def bench_roundtrip(samples):
+    r = SimulatedDMM6500(time_scale=1.0)
+    do_query(r, 'set_nplc', 'VOLT:DC', [0.0005])
+    do_query(r, 'set_auto_zero', 'VOLT:DC', [False])
+    return [latency_result('roundtrip.measure', 'roundtrip', time_calls(lambda: r.query(':MEAS?'), samples))]
+
+# Command formatting and response parsing, without any transport
+def bench_parse(samples, chunk_size):
+    results = []
+    for name, mm_state, args in [('measure', None, []), ('set_nplc', 'VOLT:DC', [0.01]), ('set_range', 'VOLT:DC', ['auto'])]:
+        results.append(latency_result(f'parse.query_text.{name}', 'parse', time_calls(
+            lambda: query_text(all_query_templates[name], mm_state, args), samples)))
+        results.append(latency_result(f'parse.compiled.{name}', 'parse', time_calls(
+            lambda: compiled_commands[name].text(mm_state, args), samples)))
+    results.append(latency_result('parse.measure_response', 'parse', time_calls(
+        lambda: compiled_commands['measure'].return_convert('+1.234567890E+00\n'), samples)))
+
+    # Bulk buffer decoding: ASCII REL,READ text versus little-endian binary REAL
+    pairs = np.column_stack([np.arange(chunk_size) * 1e-3, np.random.default_rng(0).normal(size=chunk_size)])
+    text = ','.join(f'{v:.9E}' for v in pairs.ravel())
+    raw = pairs.astype('<f8').tobytes()
+    iterations = max(samples // 100, 5)
+    results.append(latency_result('parse.buffer_ascii', 'parse', time_calls(
+        lambda: _parse_buffer_data(text), iterations), chunk_size))
+    results.append(latency_result('parse.buffer_binary', 'parse', time_calls(
+        lambda: np.frombuffer(raw, dtype='<f8').reshape(-1, 2), iterations), chunk_size))
+    return results
+
+# Storage cost for the legacy per-row CSV append (per reading) and for each output sink (per block of
+# STORAGE_BLOCK readings, the final flush on closing included in the last block)
+STORAGE_BLOCK = 100
+
+def bench_storage(samples, directory):
+    readings = [(time.time() + i * 1e-3, 1.0 + i * 1e-6) for i in range(samples)]
+    results = []
+
+    filename = os.path.join(directory, 'legacy.csv')
+    def legacy_write(t, value):
+        with open(filename, 'a', newline='') as csvfile:
+            csv.writer(csvfile).writerow([format_timestamp(t), value])
+    results.append(latency_result('storage.csv_reopen_per_row', 'storage', time_calls(
+        lambda it=iter(readings): legacy_write(*next(it)), samples)))
+
+    for kind in SINKS:
+        try:
+            sink = open_sink(kind, sink_filename(os.path.join(directory, 'bench.csv'), kind), 'Voltage')
+        except ImportError:
+            continue  # Optional dependency not installed
+        blocks = [readings[i:i + STORAGE_BLOCK] for i in range(0, samples, STORAGE_BLOCK)]
+        with sink:
+            latencies = time_calls(lambda it=iter(blocks): sink.write_readings(next(it)), len(blocks))
+            start = time.perf_counter()
+        latencies[-1] += time.perf_counter() - start
+        results.append(latency_result(f'storage.{kind}', 'storage', latencies, [len(block) for block in blocks]))
+    return results
+
+# End-to-end acquisition throughput: interval polling versus buffered bursts over the simulated transport
+def bench_end_to_end(samples, chunk_size):
+    results = []
+    r = SimulatedDMM6500(time_scale=1.0)
+    do_query(r, 'set_nplc', 'VOLT:DC', [0.0005])
+    do_query(r, 'set_auto_zero', 'VOLT:DC', [False])
+    results.append(latency_result('acquire.measure_loop', 'end_to_end', time_calls(
+        lambda: do_query(r, 'measure', 'VOLT:DC', []), samples)))
+
+    burst_samples = samples * 20
+    for binary in (False, True):
+        # Each chunk's latency runs from the previous chunk (or the start of the burst) until it arrives
+        latencies, sizes = [], []
+        start = time.perf_counter()
+        for chunk in burst_readings(r, 'VOLT:DC', burst_samples, chunk_size, binary=binary):
+            now = time.perf_counter()
+            latencies.append(now - start)
+            sizes.append(len(chunk))
+            start = now
+        results.append(latency_result(f"acquire.burst_{'binary' if binary else 'ascii'}", 'end_to_end', latencies, sizes))
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the DMM6500 acquisition path against the simulator.')
+    parser.add_argument('--samples', type=int, default=2000, help='operations per benchmark (default 2000)')
+    parser.add_argument('--chunk-size', type=int, default=10000, help='readings per buffer transfer (default 10000)')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        results = (bench_roundtrip(args.samples) + bench_parse(args.samples, args.chunk_size)
+                   + bench_storage(args.samples, directory) + bench_end_to_end(args.samples, args.chunk_size))
+
+    print(f"{'benchmark':<32} {'items/s':>12} {'p50 us':>10} {'p90 us':>10} {'p99 us':>10}")
+    for result in results:
+        print(f"{result['name']:<32} {result['items_per_s']:>12.0f} {result['p50_us']:>10.2f} "
+              f"{result['p90_us']:>10.2f} {result['p99_us']:>10.2f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'meta': {'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'python': platform.python_version(),
+                                'platform': platform.platform(), 'samples': args.samples, 'chunk_size': args.chunk_size},
+                       'results': results}, f, indent=2)
@@ -0,0 +1,43 @@
+# Micro-benchmark comparing the compiled SCPI commands against per-call template parsing (query_text)
+import timeit  # Import timeit for timing the hot path
+from dmm6500_scpi import Function, all_query_templates, do_query, query_text
+
+# Resource that answers every query instantly, so only the command formatting and parsing is timed
+class NullResource:
+    @staticmethod
+    def write(txt):
+        pass
+
+    @staticmethod
+    def query(txt):
+        return '1.0'
+
+# Template calls timed by the benchmark: (template name, mode, arguments)
+CASES = [
+    ('measure', None, []),
+    ('set_function', None, [Function.DC_VOLTAGE]),
+    ('set_range', 'VOLT:DC', ['auto']),
+    ('set_nplc', 'VOLT:DC', [0.01]),
+    ('display_user_text', None, [1, 'hello']),
+]
+
+# do_query as it was before the templates were compiled: the template is re-parsed on every call
+def uncompiled_do_query(r, template_name, mm_state, args):
+    method, cmd, return_convert = query_text(all_query_templates[template_name], mm_state, args)
+    if method == 'write':
+        r.write(cmd)
+        return None
+    return return_convert(r.query(cmd))
+
+# Time one call and return the best per-call time in microseconds
+def per_call_us(func, number):
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+if __name__ == "__main__":
+    number = 20000
+    r = NullResource()
+    print(f"{'template':<20} {'query_text':>12} {'compiled':>12} {'speedup':>8}")
+    for name, mm_state, args in CASES:
+        old = per_call_us(lambda: uncompiled_do_query(r, name, mm_state, args), number)
+        new = per_call_us(lambda: do_query(r, name, mm_state, args), number)
+        print(f"{name:<20} {old:>10.2f}us {new:>10.2f}us {old / new:>7.1f}x")
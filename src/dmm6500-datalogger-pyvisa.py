@@ -1,183 +1,43 @@
 # Import necessary libraries and modules
-import pyvisa  # Import PyVISA library for communication with instruments
-import csv  # Import CSV module for reading and writing CSV files
-import time  # Import time module for time-related functions
-from tqdm import tqdm  # Import tqdm for displaying progress bars
-import re  # Import re module for regular expressions
-from enum import Enum  # Import Enum class for creating enumeration types
-from typing import Union, Callable  # Import Union and Callable for type hints
-
-# Define a dummy class for visa.Resource for testing purposes
-class DummyVisaResource:
-    @staticmethod
-    def write(txt):
-        print(f'scpi write: {txt}')  # Print the SCPI command sent for debugging purposes
-
-    @staticmethod
-    def query(txt):
-        print(f'scpi query: {txt}')  # Print the SCPI query sent for debugging purposes
-        return ""  # Return an empty string as a dummy response
-
-# Union type for specifying multiple types for the instrument resource
-MMResourceType = Union[pyvisa.resources.Resource, DummyVisaResource]
-
-# Define SCPI commands and their parameters using Enum
-class Function(Enum):
-    DC_VOLTAGE = 'VOLT:DC'
-    AC_VOLTAGE = 'VOLT:AC'
-    DC_CURRENT = 'CURR:DC'
-    AC_CURRENT = 'CURR:AC'
-    RESISTANCE = 'RES'
-    FOUR_WIRE_RESISTANCE = 'FRES'
-    DIODE = 'DIO'
-    CAPACITANCE = 'CAP'
-    TEMPERATURE = 'TEMP'
-    CONTINUITY = 'CON'
-    FREQUENCY = 'FREQ'
-    PERIOD = 'PER'
-    VOLTAGE_RATIO = 'VOLT:RAT'
-
-    def __str__(self):
-        return self.value
-
-# Define SCPI screen commands using Enum
-class Screen(Enum):
-    HOME = 'HOME'
-    HOME_LARGE = 'HOME_LARGE_READING'
-    READING_TABLE = 'READING_TABLE'
-    GRAPH = 'GRAPH'
-    HISTOGRAM = 'HISTOGRAM'
-    SWIPE_FUNCTIONS = 'SWIPE_FUNCTIONS'
-    SWIPE_GRAPH = 'SWIPE_GRAPH'
-    SWIPE_SECONDARY = 'SWIPE_SECONDARY'
-    SWIPE_SETTINGS = 'SWIPE_SETTINGS'
-    SWIPE_STATISTICS = 'SWIPE_STATISTICS'
-    SWIPE_USER = 'SWIPE_USER'
-    SWIPE_CHANNEL = 'SWIPE_CHANNEL'
-    SWIPE_NONSWITCH = 'SWIPE_NONSWITCH'
-    SWIPE_SCAN = 'SWIPE_SCAN'
-    CHANNEL_CONTROL = 'CHANNEL_CONTROL'
-    CHANNEL_SETTINGS = 'CHANNEL_SETTINGS'
-    CHANNEL_SCAN = 'CHANNEL_SCAN'
-    PROCESSING = 'PROCESSING'
-
-    def __str__(self):
-        return self.value
-
-# Define SCPI query templates
-query_templates = {
-    # Commands
-    'reset': ['*RST'],  # Reset command
-    'measure': [':MEAS?', lambda s: float(s)],  # Measure command
-
-    'clear_log': [':SYST:CLEAR'],  # Clear log command
-    'system_error_next': [':SYST:ERR:NEXT?', lambda s: _parse_log_event(s)],  # Get next system error command
-
-    'clear_user_screen': [':DISP:CLEAR'],  # Clear user screen command
-    'display_user_text': [lambda line, text: f':DISP:USER{line}:TEXT "{text}"',  # Display user text command
-                          lambda line: line if line in {1, 2} else None,
-                          lambda text: str(text)],
-
-    # Simple queries
-    'detected_line_frequency': [':SYST:LFR?', float],  # Query detected line frequency command
-
-    # Setting of settings
-    'set_function': [':SENS:FUNC "{0}"',  # Set function command
-                     lambda val: str(val) if str(val) in list(map(str, Function)) else None],
-    'set_screen': [':DISP:SCREEN {0}',  # Set screen command
-                   lambda val: str(val) if str(val) in list(map(str, Screen)) else None],
-
-    'set_range': [lambda v, mm_func: f':SENS:{mm_func}:RANG {v}' if v != 'auto' else f':SENS:{mm_func}:RANG:AUTO ON',  # Set range command
-                  lambda val: val if val == 'auto' or isinstance(val, (float, int)) else None],
-}
-
-# Define SCPI sense queries
-sense_queries = {
-    'set_auto_zero': ['AZER {0}', lambda val: {False: 'OFF', True: 'ON'}.get(val, None)],  # Set auto zero command
-    'set_nplc': ['NPLC {0}', lambda val: float(val) if (0.0005 <= float(val) <= 12.0) else None],  # Set NPLC command
-}
-
-# Function to transform sense queries
-def _sense_queries_transform(template):
-    format_func = template[0]
-    assert isinstance(format_func, str)
-    return [':SENS:{mm_func}:' + format_func] + template[1:]
-
-# Function to combine all queries
-def _combined_queries(queries_templates, _sense_queries):
-    result = dict()
-    result.update(queries_templates)
-    result.update(dict((name, _sense_queries_transform(val)) for name, val in _sense_queries.items()))
-    return result
-
-# Function to parse log event
-def _parse_log_event(s):
-    groups = re.fullmatch(r'([+\-\d]+),"(.+)"', s.strip()).groups()
-    return int(groups[0]), groups[1]
-
-# Function to generate query text
-def query_text(template, mm_state, values):
-    formt = template[0]
-    rest = template[1:]
-
-    if isinstance(formt, str):
-        requires_mm_state = formt.count('{mm_func}') == 1
-        no_required_args = formt.count('{') - (1 if requires_mm_state else 0)
-    else:
-        param_info = inspect.signature(formt).parameters
-        requires_mm_state = 'mm_func' in param_info
-        no_required_args = len(param_info) - (1 if requires_mm_state else 0)
-
-    parameter_convert_funcs = rest[:no_required_args]
-
-    if no_required_args != len(values):
-        raise ValueError
-
-    if len(rest) > no_required_args:
-        return_convert = rest[-1]
-    else:
-        return_convert = None
-
-    query_type = 'write' if return_convert is None else 'query'
-
-    converted_values = [f(v) for f, v in zip(parameter_convert_funcs, values)]
-    if None in converted_values:
-        raise ValueError
-
-    if isinstance(formt, str):
-        return query_type, formt.format(*converted_values, mm_func=mm_state), return_convert
-    else:
-        if requires_mm_state:
-            return query_type, formt(*converted_values, mm_func=mm_state), return_convert
-        else:
-            return query_type, formt(*converted_values), return_convert
-
-# Combine all query templates
-all_query_templates = _combined_queries(query_templates, sense_queries)
-
-# Function to execute query
-def do_query(r: MMResourceType, template_name, mm_state, args):
-    method, cmd, return_convert = query_text(all_query_templates[template_name], mm_state, args)
-    if method == 'write':
-        r.write(cmd)
-        return None
-    elif method == 'query':
-        convert = return_convert if return_convert is not None else lambda x: x
-        return convert(r.query(cmd))
-    else:
-        assert False
+import math  # Import math for recognizing gap markers
+import os  # Import os for building per-instrument file names
+import sys  # Import sys for telling interactive from command-line runs
+import time  # Import time module for timestamping gaps in bursts
+from concurrent.futures import ThreadPoolExecutor  # Import ThreadPoolExecutor for polling several DMMs concurrently
+from contextlib import ExitStack, contextmanager  # Import ExitStack for managing one writer and pipeline per DMM
+from dmm6500_scpi import MMResourceType, apply_settings, do_query  # Import the SCPI command layer
+from dmm6500_config import (DEFAULT_RESOURCE_ADDRESS, build_parser, config_digitize_function, config_from_args,
+                            config_function, config_scan_list, config_segmented, config_settings, format_config,
+                            resolve_config, setup_commands)  # Import the run config
+from dmm6500_acquisition import burst_readings  # Import buffered burst acquisition
+from dmm6500_writer import SINKS, StreamingCSVWriter, format_timestamp, open_sink, sink_filename  # Import the output sinks
+from dmm6500_stats import SUMMARY_HEADER, StatsStage  # Import the on-line statistics and decimation stage
+from dmm6500_capture import EventCapture  # Import the trigger-on-event capture stage
+from dmm6500_segments import SegmentedSink  # Import the rotating, resumable segmented output
+from dmm6500_scan import gap_table, scan_header, scan_readings  # Import the scanner card scan engine
+from dmm6500_digitize import DIGITIZE_CHUNK_SIZE, digitize  # Import the digitize function capture
+from dmm6500_autotune import autotune, save_profile, tune_profile  # Import the NPLC/auto zero/range autotuner
+from dmm6500_shm import SharedRing  # Import the shared memory ring for live local readers
+from dmm6500_supervisor import GAP, ConnectionLost, SupervisedResource  # Import the reconnecting connection supervisor
+from dmm6500_scheduler import IntervalScheduler  # Import the monotonic-clock sampling scheduler
+from dmm6500_pipeline import Pipeline  # Import the producer/consumer pipeline feeding the sinks
+import dmm6500_metrics  # Import the opt-in latency metrics
+from dmm6500_sim import SimulatedDMM6500  # Import the simulated DMM6500 for offline runs
 
 # Function to connect to the DMM
-def connect_to_dmm():
-    # Define a default value for resource_address
-    resource_address = "USB0::0x05E6::0x6500::04453860::INSTR"
-    
+def connect_to_dmm(resource_address=DEFAULT_RESOURCE_ADDRESS, rm=None):
     try:
-        # Create a resource manager instance
-        rm = pyvisa.ResourceManager()
-        
-        # Try to open a connection to the instrument using the specified resource address
-        inst = rm.open_resource(resource_address, timeout=500)  # Set a longer timeout
+        if resource_address.startswith('SIM::'):
+            # Simulated DMM6500 (e.g. SIM::1::INSTR) for running without an instrument attached
+            inst = SimulatedDMM6500(resource_address, serial=f"SIM{resource_address.split('::')[1]}")
+        else:
+            # Create a resource manager instance unless a shared one was given
+            if rm is None:
+                import pyvisa  # Import PyVISA library for communication with instruments
+                rm = pyvisa.ResourceManager()
+
+            # Try to open a connection to the instrument using the specified resource address
+            inst = rm.open_resource(resource_address, timeout=500)  # Set a longer timeout
         
         # Query the instrument to get its identification string
         idn = inst.query('*IDN?')
@@ -199,35 +59,412 @@ def connect_to_dmm():
     print("Failed to connect to the Keithley DMM6500.")
     return None
 
+# Function to get the serial number of a connected DMM from its identification string
+def dmm_serial_number(r: MMResourceType):
+    # e.g. "KEITHLEY INSTRUMENTS,MODEL DMM6500,04453860,1.7.12b"
+    fields = r.query('*IDN?').split(',')
+    return fields[2].strip() if len(fields) > 2 else r.resource_name
+
+# Function to connect to several DMMs through one shared resource manager, keyed by serial number.
+# 'all' discovers every DMM6500 the resource manager can list (USB, and LAN instruments it knows of).
+# With supervise=True every DMM is wrapped in a SupervisedResource that reconnects after transport faults.
+def connect_to_dmms(resource_addresses=(DEFAULT_RESOURCE_ADDRESS,), rm=None, supervise=False):
+    if rm is None and not all(address.startswith('SIM::') for address in resource_addresses):
+        import pyvisa  # Import PyVISA library for communication with instruments
+        rm = pyvisa.ResourceManager()
+    addresses = []
+    for address in resource_addresses:
+        if address == 'all':
+            addresses.extend(rm.list_resources('?*::INSTR'))
+        elif address not in addresses:
+            addresses.append(address)
+
+    instruments = {}
+    for address in dict.fromkeys(addresses):  # Keep order, drop duplicates
+        inst = connect_to_dmm(address, rm)
+        if inst:
+            if supervise:
+                inst = SupervisedResource(lambda address=address: connect_to_dmm(address, rm), inst)
+            instruments[dmm_serial_number(inst)] = inst
+    return instruments
+
+# Function to measure on all DMMs concurrently; a DMM that fails gives None instead of stopping the others,
+# unless stop_on_error is set, in which case the failure is raised once it is reported
+def measure_all(instruments, mm_state, executor, stop_on_error=False):
+    futures = {name: executor.submit(do_query, inst, 'measure', mm_state, []) for name, inst in instruments.items()}
+    results = {}
+    for name, future in futures.items():
+        try:
+            results[name] = future.result()
+        except ConnectionLost:
+            results[name] = None  # The supervisor reports the outage and reconnects
+        except Exception as e:
+            print(f"Measurement on {name} failed: {e}")
+            if stop_on_error:
+                raise
+            results[name] = None
+    return results
+
+# Function to derive the per-instrument CSV filename when logging several DMMs
+def stream_filename(filename, name, multiple):
+    if not multiple:
+        return filename
+    stem, ext = os.path.splitext(filename)
+    return f"{stem}_{name}{ext or '.csv'}"
+
+# Function to ask for the run settings interactively; returns a resolved config like the command line does
+def prompt_config():
+    config = {}
+    # Prompt for the instruments to log; several addresses share one resource manager and are polled concurrently
+    addresses = input(f"Resource addresses, comma separated, or 'all' to discover [{DEFAULT_RESOURCE_ADDRESS}]: ").strip()
+    config['resources'] = addresses or None
+
+    # Prompt the user for measurement type, CSV filename, number of samples, and sample interval
+    config['function'] = input("What kind of measurement do you want to take (voltage/current/resistance)? ").strip().lower()
+    config['output'] = input("Enter the name of the CSV file to save the measurements: ")
+    config['formats'] = input(f"Output formats, comma separated ({'/'.join(SINKS)}) [csv]: ") or None
+    config['samples'] = int(input("How many samples do you want to take? "))
+    config['mode'] = input("Acquisition mode (interval/burst) [interval]: ").strip().lower() or None
+    if config['mode'] == 'burst':
+        config['transfer'] = input("Transfer format (ascii/binary) [binary]: ").strip().lower() or None
+    else:
+        config['interval'] = float(input("Enter the time interval between samples (in seconds): "))
+    # Optional on-line statistics: windowed summary rows and a min/max decimated trace instead of (or besides) raw readings
+    config['summary_window'] = float(input("Summary window in seconds (blank for none): ") or 0)
+    config['decimation'] = int(input("Decimation factor for a min/max trace (blank for none): ") or 0)
+    if config['summary_window'] or config['decimation']:
+        config['store_raw'] = input("Store raw readings too? (y/n) [y]: ").strip().lower() != 'n'
+    # Optional event capture: only store windows of readings around level or slope triggers
+    config['trigger'] = input("Event trigger, e.g. 'level 3.0' or 'slope 5' (blank to store every reading): ").strip() or None
+    if config['trigger']:
+        config['pre_trigger'] = int(input("Readings to keep before each event [100]: ") or 100)
+        config['post_trigger'] = int(input("Readings to keep after each event [100]: ") or 100)
+    return resolve_config(config)
+
+# Function to run a scanner card scan list on every instrument, writing one CSV table of whole scans per instrument
+def run_scan(config, instruments, progress_bar):
+    multiple = len(instruments) > 1
+    scan_list = config_scan_list(config)
+    layout = config['scan_layout']
+
+    rows_per_scan = len(scan_list.channels) if layout == 'long' else 1
+
+    def make_writer(writer):
+        # Items are (table, scans); timestamps formatted like the other CSV files, the channel column of the
+        # long layout as an integer
+        def write_table(item):
+            table, scans = item
+            if layout == 'long':
+                writer.write_rows([format_timestamp(t), int(c), v] for t, c, v in table)
+            else:
+                writer.write_rows([format_timestamp(row[0]), *row[1:]] for row in table)
+            progress_bar.update(scans)
+
+        return write_table
+
+    def run_one(name, sink):
+        remaining = config['samples']
+        while remaining > 0:
+            try:
+                for table in scan_readings(instruments[name], scan_list, remaining, config['interval'],
+                                           binary=config['transfer'] == 'binary', layout=layout):
+                    remaining -= len(table) // rows_per_scan
+                    sink((table, len(table) // rows_per_scan))
+                break
+            except ConnectionLost:
+                # Mark the gap, wait for the supervisor to reconnect and scan again for the scans still to do
+                sink((gap_table(time.time(), scan_list.channels, layout), 0))
+                instruments[name].wait_connected()
+        if remaining > 0:
+            print(f"Scan{f' on {name}' if multiple else ''} ended after {config['samples'] - remaining} of {config['samples']} scans")
+
+    with ExitStack() as stack:
+        pipelines = {}
+        for name in instruments:
+            writer = stack.enter_context(StreamingCSVWriter(stream_filename(config['output'], name, multiple),
+                                                            header=scan_header(scan_list, layout)))
+            pipeline = Pipeline()
+            pipeline.add_sink('csv', make_writer(writer))
+            pipelines[name] = stack.enter_context(pipeline)
+        with ThreadPoolExecutor(max_workers=len(instruments)) as executor:
+            futures = {name: executor.submit(run_one, name, pipelines[name].publish) for name in instruments}
+            for name, future in futures.items():
+                try:
+                    future.result()
+                except Exception as e:  # E.g. a transport fault with reconnecting off
+                    print(f"Scan{f' on {name}' if multiple else ''} stopped: {e}")
+    return pipelines
+
+# Function to digitize a capture on every instrument. With the memmap format the readings stream straight into
+# the memory-mapped file, otherwise into an array in memory; the other formats are written from it afterwards.
+# Returns the number of readings of every instrument whose capture finished; failures are reported.
+def run_digitize(config, instruments, progress_bar):
+    multiple = len(instruments) > 1
+    function = config_digitize_function(config)
+    label = config['function'].replace('dc_', '').capitalize()  # Column name, e.g. Voltage
+
+    def run_one(name):
+        stream = stream_filename(config['output'], name, multiple)
+        filename = sink_filename(stream, 'memmap') if 'memmap' in config['formats'] else None
+        readings = digitize(instruments[name], function, config['sample_rate'], config['samples'], filename=filename,
+                            aperture=config['aperture'], range=config['range'], progress=progress_bar.update)
+        for kind in config['formats']:
+            if kind != 'memmap':
+                with open_sink(kind, sink_filename(stream, kind), label) as sink:
+                    for i in range(0, len(readings), DIGITIZE_CHUNK_SIZE):
+                        sink.write_readings(readings[i:i + DIGITIZE_CHUNK_SIZE])
+        return len(readings)
+
+    with ThreadPoolExecutor(max_workers=len(instruments)) as executor:
+        futures = {name: executor.submit(run_one, name) for name in instruments}
+        taken = {}
+        for name, future in futures.items():
+            try:
+                taken[name] = future.result()
+            except Exception as e:  # The instrument rejected the setup or went away mid-capture
+                print(f"Digitizing{f' on {name}' if multiple else ''} stopped: {e}")
+        return taken
+
+# Function to find the fastest settings meeting the resolution a config asks for on the first instrument,
+# apply them and write them as a profile (if a path is given) for later runs to use with --profile
+def tune(config, profile_path=None):
+    instruments = connect_to_dmms(config['resources'])
+    if not instruments:
+        return
+    name, inst = next(iter(instruments.items()))
+    resolution = config['autotune']
+    print(f"Tuning {name} for a resolution of {resolution:g}")
+    print(f"{'NPLC':>8} {'auto zero':>9} {'range':>8} {'noise':>12} {'readings/s':>12}")
+
+    def show_point(point):
+        range_ = '-' if point.range is None else str(point.range)
+        print(f"{point.nplc:>8g} {'on' if point.auto_zero else 'off':>9} {range_:>8} {point.noise:>12.4g} {point.rate:>12.1f}")
+
+    line_frequency = do_query(inst, 'detected_line_frequency', None, [])  # NPLC reading times follow the mains
+    try:
+        best, _ = autotune(inst, config_function(config), resolution, ranges=config['tune_ranges'] or [None],
+                           line_frequency=line_frequency, binary=config['transfer'] == 'binary', progress=show_point)
+    except RuntimeError as e:
+        print(f"Tuning failed: {e}")
+        return
+    profile = tune_profile(config['function'], best)
+    apply_settings(inst, config_settings({**config, **profile}))
+    print(f"Best: NPLC {best.nplc:g}, auto zero {'on' if best.auto_zero else 'off'}"
+          f"{'' if best.range is None else f', range {best.range}'}: noise {best.noise:.4g}, {best.rate:.1f} readings/s")
+    if profile_path:
+        save_profile(profile_path, profile, resolution, best)
+        print(f"Profile written to {profile_path}")
+
+# Function to collect latency metrics while the block runs, if the config asks for an endpoint or dump file;
+# yields the Metrics, or None when instrumentation stays off
+@contextmanager
+def collect_metrics(config):
+    if config['metrics_port'] is None and not config['metrics_file']:
+        yield None
+        return
+    metrics = dmm6500_metrics.enable()
+    try:
+        with ExitStack() as stack:
+            if config['metrics_port'] is not None:
+                server = dmm6500_metrics.serve(metrics, config['metrics_port'])
+                stack.callback(server.shutdown)
+                print(f"Serving metrics at http://127.0.0.1:{config['metrics_port']}/metrics")
+            if config['metrics_file']:
+                stack.enter_context(dmm6500_metrics.MetricsReporter(metrics, config['metrics_file'], config['metrics_interval']))
+            yield metrics
+    finally:
+        dmm6500_metrics.disable()
+
+# Function to log readings from the instruments of a resolved config; metrics (see collect_metrics) also get the
+# pipeline queues, the schedule keeping and a reading count
+def run(config, metrics=None):
+    from tqdm import tqdm  # Import tqdm for displaying progress bars
+
+    instruments = connect_to_dmms(config['resources'], supervise=config['reconnect'])
+    if not instruments:
+        return
+
+    if config['mode'] == 'digitize':
+        progress_bar = tqdm(total=config['samples'] * len(instruments), desc='Progress', unit=' reading', ascii="░▒█")
+        taken = run_digitize(config, instruments, progress_bar)
+        progress_bar.close()
+        for name, count in taken.items():
+            short = f" of {config['samples']}" if count < config['samples'] else ''
+            print(f"Digitized{f' {name}' if len(instruments) > 1 else ''}: {count}{short} readings at {config['sample_rate']} readings/s")
+        if metrics is not None:
+            print(metrics.table())
+        return
+
+    if config['mode'] == 'scan':
+        # The instruments step through the scan list themselves; the readings come back in bulk
+        progress_bar = tqdm(total=config['samples'] * len(instruments), desc='Progress', unit=' scan', ascii="░▒█")
+        pipelines = run_scan(config, instruments, progress_bar)
+        progress_bar.close()
+        for name, pipeline in pipelines.items():
+            print(f"Pipeline{f' {name}' if len(instruments) > 1 else ''}: {pipeline.summary()}")
+        if metrics is not None:
+            print(metrics.table())
+        return
+
+    multiple = len(instruments) > 1
+    mm_state = str(config_function(config))
+    label = config['function'].replace('_', ' ').capitalize()  # Column name, e.g. Voltage
+    num_samples = config['samples']
+    summary_window, decimation = config['summary_window'], config['decimation']
+    store_raw = config['store_raw'] or not (summary_window or decimation)
+    resume = config['resume']
+
+    # Select the function and apply the range, NPLC and auto zero settings in one transfer per instrument
+    for name, inst in instruments.items():
+        # A supervised DMM records the settings so it can restore them after reconnecting
+        for code, message in apply_settings(inst, config_settings(config), cache=getattr(inst, 'cache', None)):
+            print(f"Setting up {name} failed: {code}, {message}")
+
+    # Initialize tqdm progress bar
+    progress_bar = tqdm(total=num_samples * len(instruments), desc='Progress', unit=' sample', ascii="░▒█")
+
+    # Sinks run on their own threads so a slow disk or terminal never stalls instrument polling.
+    # Items are (readings, slots) where readings is a sequence of (epoch time, value) pairs.
+    def make_console(name):
+        def show_readings(item):
+            readings, slots = item
+            t, value = readings[-1]
+            prefix = f"[{name}] " if multiple else ""
+            suffix = f" ({len(readings)} readings)" if len(readings) > 1 else ""
+            print(f"{prefix}{format_timestamp(t)} - {label}: {'no reading' if math.isnan(value) else value}{suffix}")
+            progress_bar.set_postfix(queue=sum(p.depth() for p in pipelines.values()))  # Show the backlog waiting for the sinks
+            progress_bar.update(slots)  # Update progress bar
+
+        return show_readings
+
+    # One pipeline per instrument feeding its output sinks; with several DMMs every file shares the same tick timestamps
+    pipelines = {}
+    stats_stages = {}
+    captures = {}
+    with ExitStack() as stack:
+        for name in instruments:
+            pipeline = Pipeline()
+            stream = stream_filename(config['output'], name, multiple)
+            if summary_window or decimation:
+                stem = os.path.splitext(stream)[0]
+                # A resumed run appends to the summary and trace of the earlier run
+                summary_writer = stack.enter_context(StreamingCSVWriter(
+                    f"{stem}_summary.csv", header=SUMMARY_HEADER, append=resume and os.path.exists(f"{stem}_summary.csv"))) if summary_window else None
+                trace_writer = stack.enter_context(StreamingCSVWriter(
+                    f"{stem}_trace.csv", header=['Timestamp', label], append=resume and os.path.exists(f"{stem}_trace.csv"))) if decimation else None
+                # Entered after its writers so the last window and block are written before they close
+                stats_stages[name] = stack.enter_context(StatsStage(summary_window, summary_writer, decimation, trace_writer))
+                pipeline.add_sink('stats', stats_stages[name])
+            raw_sinks = {}
+            for kind in (config['formats'] if store_raw else []):
+                # Each output file is opened once; readings are batched in memory and flushed periodically
+                if config_segmented(config):
+                    # Rotating segments listed in a manifest, so a crashed run can be resumed and read in parts
+                    raw_sinks[kind] = stack.enter_context(SegmentedSink(
+                        kind, sink_filename(stream, kind), label, config['rotate_rows'], config['rotate_seconds'],
+                        int(config['rotate_mb'] * 1e6) if config['rotate_mb'] else None, resume))
+                else:
+                    raw_sinks[kind] = stack.enter_context(open_sink(kind, sink_filename(stream, kind), label))
+            if config['trigger'] and raw_sinks:
+                # A ring buffer of recent readings; only windows around trigger events reach the output files
+                kind, value = config['trigger'].split()
+                captures[name] = EventCapture(list(raw_sinks.values()), config['pre_trigger'], config['post_trigger'],
+                                              level=float(value) if kind == 'level' else None,
+                                              slope=float(value) if kind == 'slope' else None)
+                pipeline.add_sink('capture', captures[name])
+            else:
+                for kind, sink in raw_sinks.items():
+                    # Storage applies backpressure instead of losing data
+                    pipeline.add_sink(kind, lambda item, sink=sink: sink.write_readings(item[0]))
+            if config['shm']:
+                # Live readings for dashboards and limit checkers in other processes; readers never block the ring
+                ring = stack.enter_context(SharedRing(f"{config['shm']}_{name}" if multiple else config['shm'],
+                                                      config['shm_size'], label))
+                pipeline.add_sink('shm', lambda item, ring=ring: ring.write_readings(item[0]))
+            pipeline.add_sink('console', make_console(name), drop_when_full=True)  # Console output may be dropped
+            pipelines[name] = stack.enter_context(pipeline)
+            if metrics is not None:
+                metrics.add_source(f"pipeline {name}", pipeline.stats)
+
+        with ThreadPoolExecutor(max_workers=len(instruments)) as executor:
+            if config['mode'] == 'burst':
+                # Let every instrument fill its reading buffer at its native rate and fetch the readings in chunks
+                def run_burst(name):
+                    remaining = num_samples
+                    while remaining > 0:
+                        try:
+                            for chunk in burst_readings(instruments[name], mm_state, remaining, binary=config['transfer'] == 'binary'):
+                                remaining -= len(chunk)
+                                pipelines[name].publish((chunk, len(chunk)))
+                                if metrics is not None:
+                                    metrics.count('readings', len(chunk))
+                            break
+                        except ConnectionLost:
+                            # Mark the gap, wait for the supervisor to reconnect and start a new burst for the rest
+                            pipelines[name].publish(([(time.time(), GAP)], 0))
+                            instruments[name].wait_connected()
+                    if remaining > 0:
+                        print(f"Burst{f' on {name}' if multiple else ''} ended after {num_samples - remaining} of {num_samples} readings")
+
+                futures = {name: executor.submit(run_burst, name) for name in instruments}
+                for name, future in futures.items():
+                    try:
+                        future.result()
+                    except Exception as e:  # E.g. a transport fault with reconnecting off
+                        print(f"Stopping the run{f' on {name}' if multiple else ''}: {e}")
+            else:
+                # Take a measurement on every instrument at every slot of a drift-free schedule
+                scheduler = IntervalScheduler(config['interval'])
+                if metrics is not None:
+                    metrics.add_source('schedule', scheduler.stats)
+                for tick in scheduler.ticks(num_samples):
+                    try:
+                        measurements = measure_all(instruments, mm_state, executor, stop_on_error=not config['reconnect'])
+                    except Exception:
+                        print("Stopping the run, since reconnecting is off")
+                        break
+                    # Slots skipped while the loop was held up (e.g. by a reconnect attempt) are written as gaps
+                    skipped = [(tick.time - tick.late - k * config['interval'], GAP) for k in range(tick.missed, 0, -1)]
+                    for name, measurement in measurements.items():
+                        # A failed measurement is written as a gap at its slot, so the timeline stays intact
+                        value = GAP if measurement is None else measurement
+                        pipelines[name].publish((skipped + [(tick.time, value)], 1 + tick.missed))
+                    if metrics is not None:
+                        metrics.count('readings', len(instruments))
+                print(f"Schedule: {scheduler.summary()}")
+    progress_bar.close()  # Close progress bar
+    for name, pipeline in pipelines.items():
+        print(f"Pipeline{f' {name}' if multiple else ''}: {pipeline.summary()}")
+    for name, inst in instruments.items():
+        if isinstance(inst, SupervisedResource) and inst.disconnects:
+            print(f"Connection{f' {name}' if multiple else ''}: {inst.summary()}")
+    for name, capture in captures.items():
+        print(f"Events{f' {name}' if multiple else ''}: {len(capture.events)} triggers, "
+              f"{capture.readings_kept} of {capture.readings_seen} readings stored")
+    for name, stage in stats_stages.items():
+        count, mean, minimum, maximum, stddev = stage.total.summary()
+        print(f"Statistics{f' {name}' if multiple else ''}: {count} readings, mean {mean:g}, min {minimum:g}, "
+              f"max {maximum:g}, stddev {stddev:g}")
+    if metrics is not None:
+        print(metrics.table())
+
 # Main function
 if __name__ == "__main__":
-    # Call the connect_to_dmm function to attempt connection to the DMM
-    dmm = connect_to_dmm()
-
-    if dmm:
-        # Prompt the user for measurement type, CSV filename, number of samples, and sample interval
-        measurement_type = input("What kind of measurement do you want to take (voltage/current/resistance)? ").upper()
-        filename = input("Enter the name of the CSV file to save the measurements: ")
-        num_samples = int(input("How many samples do you want to take? "))
-        sample_interval = float(input("Enter the time interval between samples (in seconds): "))
-
-        # Write header to CSV file
-        with open(filename, 'w', newline='') as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(['Timestamp', measurement_type.capitalize()])
-
-        # Initialize tqdm progress bar
-        progress_bar = tqdm(total=num_samples, desc='Progress', unit=' sample', ascii="░▒█")
-
-        # Loop to take measurements and record them to the CSV file
-        for _ in range(num_samples):
-            measurement = do_query(dmm, 'measure', measurement_type, [])
-            if measurement is not None:
-                timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
-                with open(filename, 'a', newline='') as csvfile:
-                    writer = csv.writer(csvfile)
-                    writer.writerow([timestamp, measurement])
-                print(f"{timestamp} - {measurement_type.capitalize()}: {measurement}")
-            time.sleep(sample_interval)
-            progress_bar.update(1)  # Update progress bar
-        progress_bar.close()  # Close progress bar
+    # Without arguments the settings are asked for interactively, otherwise they come from the options and --config
+    parser = build_parser()
+    args = parser.parse_args()
+    try:
+        config = config_from_args(args) if len(sys.argv) > 1 else prompt_config()
+    except (ValueError, OSError, ImportError) as e:
+        parser.error(str(e))
+
+    if args.dry_run:
+        # Show what would run, as a config file that reproduces it, without connecting to anything
+        print(format_config(config), end='')
+        for cmd in setup_commands(config):
+            print(f"# setup: {cmd}")
+    elif config['autotune'] is not None:
+        tune(config, args.profile)
+    else:
+        with collect_metrics(config) as metrics:
+            run(config, metrics)
@@ -0,0 +1,91 @@
+# Import necessary libraries and modules
+import time  # Import time module for polling and host timestamps
+import numpy as np  # Import NumPy for decoding binary buffer transfers into arrays
+import dmm6500_metrics  # Import the opt-in latency metrics
+from dmm6500_scpi import (MMResourceType, BUFFER_MIN_POINTS, BURST_MAX_POINTS, BURST_CHUNK_SIZE, CommandBatch,
+                          compiled_commands, do_query)  # Import the SCPI command layer
+
+# Function to fetch a range of buffer readings in the binary REAL format as an (n, 2) array of (relative time, reading)
+def fetch_buffer_binary(r: MMResourceType, mm_state, start, end):
+    _, cmd, _ = compiled_commands['buffer_data'].text(mm_state, [start, end])
+    # Little-endian doubles (:FORM:BORD SWAP) are decoded straight into an array without per-value Python objects
+    start = time.perf_counter()
+    values = r.query_binary_values(cmd, datatype='d', is_big_endian=False, container=np.array)
+    if dmm6500_metrics.active is not None:
+        dmm6500_metrics.active.record('io', 'buffer_data_binary', time.perf_counter() - start)
+    return np.asarray(values, dtype=np.float64).reshape(-1, 2)
+
+# Function to configure the instrument for a buffered burst of readings
+def configure_burst(r: MMResourceType, mm_state, count, binary=False):
+    batch = CommandBatch(r, mm_state)  # All of the setup goes out in one transfer
+    batch.add('abort')  # Make sure no trigger model is still running
+    batch.add('set_buffer_size', max(count, BUFFER_MIN_POINTS))
+    batch.add('clear_buffer')
+    batch.add('load_simple_loop', count, 0)
+    if binary:
+        batch.add('set_data_format', 'REAL')
+        batch.add('set_byte_order', 'SWAP')
+    batch.send(check_errors=False)
+
+# Function to start the configured trigger model and yield its readings in chunks as the buffer fills.
+# Stops early, without an error, if the trigger model stops first; callers compare the readings they got with count.
+def stream_buffer(r: MMResourceType, mm_state, count, chunk_size=BURST_CHUNK_SIZE, poll_interval=0.05, binary=False):
+    try:
+        do_query(r, 'initiate', mm_state, [])
+        fetched = 0
+        stopped = False  # Whether the trigger model finished or failed
+        while fetched < count:
+            available = do_query(r, 'buffer_actual', mm_state, [])
+            if available <= fetched:
+                if stopped:
+                    break  # Everything the trigger model took before it stopped has been fetched
+                if do_query(r, 'trigger_state', mm_state, []) in {'IDLE', 'ABORTED', 'FAILED'}:
+                    # Readings taken between the two queries are still in the buffer: count them once more and
+                    # drain them before giving up on the remaining readings
+                    stopped = True
+                    continue
+                time.sleep(poll_interval)
+                continue
+            end = min(available, fetched + chunk_size)
+            if binary:
+                chunk = fetch_buffer_binary(r, mm_state, fetched + 1, end)
+            else:
+                chunk = do_query(r, 'buffer_data', mm_state, [fetched + 1, end])
+            fetched = end
+            yield chunk
+    except BaseException:
+        if binary:
+            try:
+                _reset_data_format(r, mm_state)
+            except Exception:
+                pass  # E.g. the connection is gone; the error that stopped the transfer is the one to report
+        raise
+    if binary:
+        _reset_data_format(r, mm_state)
+
+# Function to switch buffer transfers back to ASCII, which other queries (e.g. :MEAS?) expect
+def _reset_data_format(r: MMResourceType, mm_state):
+    do_query(r, 'set_data_format', mm_state, ['ASCII'])
+
+# Function to take a buffered burst of readings, yielding them in chunks as the buffer fills
+def burst_acquire(r: MMResourceType, mm_state, count, chunk_size=BURST_CHUNK_SIZE, poll_interval=0.05, binary=False):
+    configure_burst(r, mm_state, count, binary)
+    yield from stream_buffer(r, mm_state, count, chunk_size, poll_interval, binary)
+
+# Function to take any number of readings as a sequence of buffered bursts
+def burst_readings(r: MMResourceType, mm_state, total, chunk_size=BURST_CHUNK_SIZE, binary=False):
+    remaining = total
+    while remaining > 0:
+        count = min(remaining, BURST_MAX_POINTS)
+        start_time = time.time()  # Host time at which the burst was started
+        taken = 0
+        for chunk in burst_acquire(r, mm_state, count, chunk_size, binary=binary):
+            taken += len(chunk)
+            if binary:
+                chunk[:, 0] += start_time  # Convert relative times to host epoch times in place
+                yield chunk
+            else:
+                yield [(start_time + rel, value) for rel, value in chunk]
+        if taken < count:
+            break  # The instrument stopped early; don't start another burst
+        remaining -= count
@@ -0,0 +1,149 @@
+# Import necessary libraries and modules
+import os  # Import os for the default number of worker processes
+from concurrent.futures import ProcessPoolExecutor  # Import ProcessPoolExecutor for analysing many captures at once
+import numpy as np  # Import NumPy for the vectorized analyses
+from dmm6500_reader import open_dataset  # Import the dataset reader every capture format goes through
+
+SPIKE_THRESHOLD = 6.0  # Robust z-score above which a reading is an outlier
+SPIKE_WINDOW = 5  # Readings in the window a reading is compared with, itself included (odd)
+HISTOGRAM_BINS = 50
+
+# Record layout of detected spikes: time and value of the peak, its deviation from the local baseline, its index
+# and the number of outlying readings
+SPIKE_DTYPE = np.dtype([('time', '<f8'), ('value', '<f8'), ('deviation', '<f8'), ('index', '<i8'), ('width', '<i8')])
+
+
+# Function to compute summary statistics of an array of readings in one pass of vectorized reductions
+def summarize(values):
+    values = np.asarray(values, dtype=np.float64)
+    if not len(values):
+        return {'count': 0}
+    p1, p50, p99 = np.percentile(values, [1, 50, 99])
+    return {
+        'count': len(values),
+        'mean': float(values.mean()),
+        'std': float(values.std(ddof=1)) if len(values) > 1 else 0.0,
+        'min': float(values.min()),
+        'max': float(values.max()),
+        'p1': float(p1),
+        'median': float(p50),
+        'p99': float(p99),
+        'rms': float(np.sqrt(np.mean(values ** 2))),
+    }
+
+
+# Function to find the dominant period of a signal from its spectrum. Readings are interpolated onto an even grid
+# at their median spacing first, so uneven or interrupted sampling still works. Returns (period in seconds,
+# share of the signal's variance in that spectral line), or (None, 0.0) for too few readings.
+def dominant_period(times, values):
+    times = np.asarray(times, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    if len(times) < 8:
+        return None, 0.0
+    dt = float(np.median(np.diff(times)))
+    if dt <= 0:
+        return None, 0.0
+    grid = np.arange(times[0], times[-1], dt)
+    even = np.interp(grid, times, values)
+    even -= even.mean()
+    power = np.abs(np.fft.rfft(even * np.hanning(len(even)))) ** 2
+    power[0] = 0.0
+    total = power.sum()
+    if total == 0:
+        return None, 0.0
+    peak = int(power.argmax())
+    frequencies = np.fft.rfftfreq(len(even), dt)
+    return float(1.0 / frequencies[peak]), float(power[peak] / total)
+
+
+# Function to find spikes: readings whose deviation from the median of the `window - 1` readings around them is
+# more than `threshold` robust standard deviations (median absolute deviation of all deviations, scaled).
+# Neighbouring outliers form one spike, reported at its largest deviation as SPIKE_DTYPE records. Spikes wider
+# than about half the window look like steps and are only caught at their edges.
+def find_spikes(times, values, threshold=SPIKE_THRESHOLD, window=SPIKE_WINDOW):
+    times = np.asarray(times, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < window:
+        return np.empty(0, dtype=SPIKE_DTYPE)
+    half = window // 2
+    padded = np.pad(values, half, mode='edge')
+    neighbours = np.delete(np.lib.stride_tricks.sliding_window_view(padded, window), half, axis=1)
+    deviation = values - np.median(neighbours, axis=1)  # A spike doesn't pull its own baseline up
+    scale = 1.4826 * np.median(np.abs(deviation - np.median(deviation)))
+    if scale == 0:
+        scale = np.finfo(np.float64).tiny  # Flat signal: any deviation at all stands out
+    outlier = np.abs(deviation) > threshold * scale
+    # Runs of neighbouring outliers
+    edges = np.diff(np.r_[0, outlier.astype(np.int8), 0])
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    spikes = np.empty(len(starts), dtype=SPIKE_DTYPE)
+    if len(starts):
+        magnitude = np.where(outlier, np.abs(deviation), -1.0)
+        peaks = starts + np.array([magnitude[s:e].argmax() for s, e in zip(starts, ends)], dtype=np.int64)
+        spikes['time'], spikes['value'], spikes['deviation'], spikes['index'] = times[peaks], values[peaks], deviation[peaks], peaks
+        spikes['width'] = ends - starts
+    return spikes
+
+
+# Function to estimate the repetition period of events (e.g. spike times) that the sampling may partly miss:
+# the shortest interval is refined over all intervals that are close to whole multiples of it.
+# Returns None for fewer than two events or intervals that aren't multiples of one period.
+def event_period(event_times, tolerance=0.1):
+    intervals = np.diff(np.sort(np.asarray(event_times, dtype=np.float64)))
+    intervals = intervals[intervals > 0]
+    if not len(intervals):
+        return None
+    base = intervals.min()
+    multiples = np.round(intervals / base)
+    regular = np.abs(intervals / base - multiples) <= tolerance
+    if regular.sum() < len(intervals) / 2:
+        return None
+    return float(intervals[regular].sum() / multiples[regular].sum())
+
+
+# Function to compute a histogram of readings as (counts, bin edges)
+def histogram(values, bins=HISTOGRAM_BINS):
+    counts, edges = np.histogram(np.asarray(values, dtype=np.float64), bins=bins)
+    return counts, edges
+
+
+# Function to run every analysis on one capture file; gap markers (NaN readings) are left out.
+# Returns plain data, so results can cross process boundaries and be written as JSON.
+def analyze_file(filename, threshold=SPIKE_THRESHOLD, bins=HISTOGRAM_BINS, window=SPIKE_WINDOW):
+    with open_dataset(filename, use_cache=False) as dataset:  # Read whole, so an index isn't worth keeping
+        readings = np.asarray(dataset.read(), dtype=np.float64)
+    readings = readings[~np.isnan(readings[:, 1])]
+    times, values = readings[:, 0], readings[:, 1]
+    spikes = find_spikes(times, values, threshold, window)
+    # The spectrum is taken without the spikes, which would otherwise spread over every frequency
+    clean = np.ones(len(values), dtype=bool)
+    clean[spikes['index']] = False
+    period, period_share = dominant_period(times[clean], values[clean])
+    # The repetition period is taken over the large spikes only, which the odd small outlier would otherwise break up
+    major = spikes[np.abs(spikes['deviation']) >= 0.5 * np.abs(spikes['deviation']).max()] if len(spikes) else spikes
+    counts, edges = histogram(values, bins) if len(values) else (np.empty(0, dtype=np.int64), np.empty(0))
+    return {
+        'file': filename,
+        'start': float(times[0]) if len(times) else None,
+        'end': float(times[-1]) if len(times) else None,
+        'summary': summarize(values),
+        'period': period,
+        'period_share': period_share,
+        'spikes': [{'time': float(s['time']), 'value': float(s['value']), 'deviation': float(s['deviation']),
+                    'width': int(s['width'])} for s in spikes],
+        'spike_period': event_period(major['time']),
+        'histogram': {'counts': counts.tolist(), 'edges': edges.tolist()},
+    }
+
+
+# Function to analyse many capture files across a pool of `workers` processes (default: one per CPU);
+# results come back in the order of the files
+def analyze_files(filenames, workers=None, threshold=SPIKE_THRESHOLD, bins=HISTOGRAM_BINS, window=SPIKE_WINDOW):
+    filenames = list(filenames)
+    workers = min(workers or os.cpu_count() or 1, len(filenames))
+    if workers <= 1:
+        return [analyze_file(filename, threshold, bins, window) for filename in filenames]
+    n = len(filenames)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(analyze_file, filenames, [threshold] * n, [bins] * n, [window] * n,
+                                 chunksize=max(1, n // (workers * 4))))
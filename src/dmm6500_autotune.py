@@ -0,0 +1,116 @@
+# Import necessary libraries and modules
+from collections import namedtuple  # Import namedtuple for the sweep results
+import os  # Import os for telling profile formats apart
+import numpy as np  # Import NumPy for the noise and rate estimates
+from dmm6500_scpi import MMResourceType, Function, apply_settings  # Import the SCPI command layer
+from dmm6500_acquisition import burst_acquire  # Import buffered bursts, which run at the instrument's native rate
+
+# NPLC values tried by default (the instrument accepts 0.0005 to 12)
+TUNE_NPLC = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0, 12.0)
+TUNE_SAMPLES = 200  # Readings taken at each point of the sweep
+TUNE_MIN_SAMPLES = 20  # Fewest readings taken at a point, however slow it is
+TUNE_POINT_TIME = 2.0  # Time a point may take (in seconds); slow points take fewer readings
+OVERFLOW = 9.9e37  # Reading the instrument returns when the signal is over range
+
+# Settings a profile may hold
+PROFILE_KEYS = ('function', 'nplc', 'auto_zero', 'range')
+
+# A point of the sweep: its settings, the measured noise (standard deviation) and the reading rate it achieved
+TunePoint = namedtuple('TunePoint', ['nplc', 'auto_zero', 'range', 'noise', 'rate'])
+
+
+# Function to estimate the noise of readings of a live signal from the spread of their second differences
+# (median absolute deviation, scaled to a standard deviation), which cancel the local slope of a drifting
+# signal and ignore the odd step
+def estimate_noise(values):
+    diffs = np.diff(np.asarray(values, dtype=np.float64), 2)
+    if not len(diffs):
+        return float('inf')
+    mad = np.median(np.abs(diffs - np.median(diffs)))
+    return float(1.4826 * mad / np.sqrt(6))
+
+
+# Function to take a burst of `count` readings with the current settings; returns (noise, readings per second).
+# A range the signal overflows gives infinite noise.
+def measure_point(r: MMResourceType, mm_state, count, binary=True):
+    readings = np.concatenate([np.asarray(chunk, dtype=np.float64).reshape(-1, 2)
+                               for chunk in burst_acquire(r, mm_state, count, binary=binary)] or [np.empty((0, 2))])
+    if len(readings) < 2 or np.any(np.abs(readings[:, 1]) >= OVERFLOW):
+        return float('inf'), 0.0
+    span = readings[-1, 0] - readings[0, 0]
+    return estimate_noise(readings[:, 1]), float((len(readings) - 1) / span) if span > 0 else float('inf')
+
+
+# Function to sweep NPLC, auto zero and range on the live signal and return the fastest settings whose noise is
+# at most `resolution` (in the units of the function), together with every point measured.
+# Each combination of range and auto zero is swept from the fastest NPLC up and stops at the first NPLC that is
+# good enough, since slower ones only cost rate. A range of None leaves the range setting alone.
+# Raises RuntimeError if no point reaches the resolution.
+def autotune(r: MMResourceType, function: Function, resolution, nplcs=TUNE_NPLC, auto_zero=(False, True),
+             ranges=(None,), samples=TUNE_SAMPLES, line_frequency=50.0, binary=True, progress=None):
+    mm_state = str(function)
+    errors = apply_settings(r, {'function': function})
+    if errors:
+        raise RuntimeError('setting the function failed: ' + '; '.join(f'{code}, {message}' for code, message in errors))
+    points = []
+    for range_ in ranges:
+        for az in auto_zero:
+            for nplc in sorted(nplcs):
+                settings = {'nplc': nplc, 'auto_zero': az}
+                if range_ is not None:
+                    settings['range'] = range_
+                errors = apply_settings(r, settings, mm_state)
+                if errors:
+                    continue  # E.g. an NPLC or range the function doesn't support
+                reading_time = nplc / line_frequency * (3 if az else 1)
+                count = int(max(TUNE_MIN_SAMPLES, min(samples, TUNE_POINT_TIME / reading_time)))
+                point = TunePoint(nplc, az, range_, *measure_point(r, mm_state, count, binary))
+                points.append(point)
+                if progress is not None:
+                    progress(point)
+                if point.noise <= resolution:
+                    break
+    good = [point for point in points if point.noise <= resolution]
+    if not good:
+        quietest = min(points, key=lambda point: point.noise, default=None)
+        raise RuntimeError(f'no setting reached a resolution of {resolution:g}' +
+                           (f'; the quietest was {quietest.noise:g} at NPLC {quietest.nplc:g}' if quietest else ''))
+    return max(good, key=lambda point: point.rate), points
+
+
+# Function to turn a tuned point into a profile: the run config settings it stands for
+def tune_profile(function_name, point: TunePoint):
+    profile = {'function': function_name, 'nplc': point.nplc, 'auto_zero': point.auto_zero}
+    if point.range is not None:
+        profile['range'] = point.range
+    return profile
+
+
+# Function to read a profile written by save_profile() (or by hand) as a run config layer
+def load_profile(path):
+    from dmm6500_config import load_config_file  # Import the run config file reader
+    profile = load_config_file(path)
+    unknown = set(profile) - set(PROFILE_KEYS)
+    if unknown:
+        raise ValueError(f"{path}: a profile only holds {', '.join(PROFILE_KEYS)}, not {', '.join(sorted(unknown))}")
+    return profile
+
+
+# Function to write a profile as a run config layer (see --profile) in the format its extension names (.toml, .yaml
+# or .yml, like load_config_file reads), noting what it was tuned for
+def save_profile(path, profile, resolution, point: TunePoint):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.toml':
+        from dmm6500_config import format_config  # Import the TOML formatting of run configs
+        text = format_config(profile)
+    elif ext in {'.yaml', '.yml'}:
+        try:
+            import yaml  # Import PyYAML for YAML profiles
+        except ImportError:
+            raise ImportError("YAML profiles need PyYAML (pip install pyyaml)") from None
+        text = yaml.safe_dump(profile, sort_keys=False)
+    else:
+        raise ValueError(f"unknown profile format {ext!r}; use .toml, .yaml or .yml")
+    with open(path, 'w') as f:
+        f.write(f'# Tuned for a resolution of {resolution:g}: noise {point.noise:g}, {point.rate:.1f} readings/s\n')
+        f.write(text)
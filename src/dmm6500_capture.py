@@ -0,0 +1,114 @@
+# Import necessary libraries and modules
+import numpy as np  # Import NumPy for the ring buffer and vectorized trigger detection
+
+
+# Fixed-size ring of the most recent (time, value) readings, preallocated as one (capacity, 2) array
+class RingBuffer:
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._data = np.empty((capacity, 2))
+        self._end = 0  # Index the next reading goes to
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    # Append a block of readings, keeping only the last `capacity` of them
+    def extend(self, block):
+        block = block[-self.capacity:] if self.capacity else block[:0]
+        n = len(block)
+        if n == 0:
+            return
+        first = min(n, self.capacity - self._end)
+        self._data[self._end:self._end + first] = block[:first]
+        self._data[:n - first] = block[first:]
+        self._end = (self._end + n) % self.capacity
+        self._size = min(self._size + n, self.capacity)
+
+    # The buffered readings, oldest first, as a new array
+    def contents(self):
+        start = (self._end - self._size) % self.capacity if self.capacity else 0
+        if start + self._size <= self.capacity:
+            return self._data[start:start + self._size].copy()
+        return np.concatenate([self._data[start:], self._data[:self._end]])
+
+    def clear(self):
+        self._end = 0
+        self._size = 0
+
+
+# Pipeline stage that only passes on windows of readings around trigger events: `pre` readings of history
+# before the trigger, the trigger reading and `post` readings after it. A level trigger fires when the
+# reading crosses `level` in the given direction ('rising', 'falling' or 'both'); a slope trigger fires when
+# the rate of change exceeds `slope` (units per second) in magnitude. A trigger inside a post-trigger window
+# extends the window. Items are (readings, slots) like the other sinks; windows go to every sink in `sinks`.
+class EventCapture:
+    def __init__(self, sinks, pre=100, post=100, level=None, direction='rising', slope=None):
+        if level is None and slope is None:
+            raise ValueError('an event capture needs a level or a slope trigger')
+        if direction not in {'rising', 'falling', 'both'}:
+            raise ValueError(f'unknown trigger direction {direction!r}')
+        self.sinks = sinks
+        self.pre = pre
+        self.post = post
+        self.level = level
+        self.direction = direction
+        self.slope = slope
+        self.events = []  # (time, value) of every trigger
+        self.readings_seen = 0
+        self.readings_kept = 0
+        self._history = RingBuffer(pre)
+        self._window_end = 0  # Stream index up to which readings belong to the current window
+        self._previous = None  # Last reading of the previous block, for edge and slope detection
+
+    # Boolean mask of the readings in a block that fire the trigger
+    def _triggers(self, times, values):
+        if self._previous is None:
+            prev_times = np.r_[np.nan, times[:-1]]
+            prev_values = np.r_[np.nan, values[:-1]]
+        else:
+            prev_times = np.r_[self._previous[0], times[:-1]]
+            prev_values = np.r_[self._previous[1], values[:-1]]
+        hits = np.zeros(len(values), dtype=bool)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if self.level is not None:
+                if self.direction in {'rising', 'both'}:
+                    hits |= (prev_values < self.level) & (values >= self.level)
+                if self.direction in {'falling', 'both'}:
+                    hits |= (prev_values > self.level) & (values <= self.level)
+            if self.slope is not None:
+                hits |= np.abs((values - prev_values) / (times - prev_times)) >= self.slope
+        return hits
+
+    def _emit(self, block):
+        if len(block):
+            self.readings_kept += len(block)
+            for sink in self.sinks:
+                sink.write_readings(block)
+
+    # Pass on the readings block[start:stop] that fall inside the current window; keep the rest as history
+    def _advance(self, block, base, start, stop):
+        inside = min(max(self._window_end - (base + start), 0), stop - start)
+        self._emit(block[start:start + inside])
+        self._history.extend(block[start + inside:stop])
+
+    def __call__(self, item):
+        block = np.asarray(item[0], dtype=np.float64).reshape(-1, 2)
+        if len(block) == 0:
+            return
+        base = self.readings_seen  # Index of the block's first reading in the whole stream
+        self.readings_seen += len(block)
+        hits = np.flatnonzero(self._triggers(block[:, 0], block[:, 1]))
+        self._previous = block[-1].copy()
+
+        pos = 0
+        for trigger in hits:
+            self._advance(block, base, pos, trigger)
+            self.events.append((float(block[trigger, 0]), float(block[trigger, 1])))
+            if self._window_end <= base + trigger:
+                self._emit(self._history.contents())  # Pre-trigger history of a new window
+                self._history.clear()  # Those readings are stored now; don't repeat them before the next event
+            self._window_end = max(self._window_end, base + trigger + 1 + self.post)
+            self._emit(block[trigger:trigger + 1])
+            pos = trigger + 1
+        self._advance(block, base, pos, len(block))
@@ -0,0 +1,324 @@
+# Import necessary libraries and modules
+import argparse  # Import argparse for the command-line interface
+import math  # Import math for converting a run duration into a sample count
+import os  # Import os for telling config file formats apart
+from dmm6500_scpi import BURST_MAX_POINTS, CommandBatch, DigitizeFunction, Function, compiled_commands  # Import the functions and SCPI templates the settings map to
+from dmm6500_scan import ScanList, parse_channels  # Import the scan list of scanner card runs
+from dmm6500_autotune import load_profile  # Import the reader of tuned profiles
+
+# Default resource address of the DMM used when none is given
+DEFAULT_RESOURCE_ADDRESS = "USB0::0x05E6::0x6500::04453860::INSTR"
+
+# Measurement functions by name: the names used by the prompts plus every Function member, e.g. 'ac_voltage'
+MEASUREMENT_FUNCTIONS = {'voltage': Function.DC_VOLTAGE, 'current': Function.DC_CURRENT, 'resistance': Function.RESISTANCE}
+MEASUREMENT_FUNCTIONS.update((f.name.lower(), f) for f in Function)
+
+# Digitize functions of the measurement functions that have one, for digitize mode
+DIGITIZE_FUNCTIONS = {'voltage': DigitizeFunction.VOLTAGE, 'dc_voltage': DigitizeFunction.VOLTAGE,
+                      'current': DigitizeFunction.CURRENT, 'dc_current': DigitizeFunction.CURRENT}
+
+# Settings of a run and their defaults; a config file, then the command line, override them.
+# Exactly one of samples and duration is needed, and an output filename, except for tuning.
+DEFAULT_CONFIG = {
+    'resources': [DEFAULT_RESOURCE_ADDRESS],  # Resource addresses, SIM::<n>::INSTR for simulators, or 'all'
+    'function': 'voltage',  # Measurement function, see MEASUREMENT_FUNCTIONS
+    'range': None,  # Measurement range, 'auto' or a number; None leaves the instrument setting alone
+    'nplc': None,  # Integration time in power line cycles (0.0005 to 12)
+    'auto_zero': None,  # Auto zero on or off
+    'samples': None,  # Number of readings per instrument
+    'duration': None,  # Run length in seconds (interval mode), instead of samples
+    'interval': 1.0,  # Time between samples in interval mode (in seconds)
+    'mode': 'interval',  # Acquisition mode: 'interval' (one :MEAS? per slot), 'burst' (buffered), 'scan' or 'digitize'
+    'transfer': 'binary',  # Buffer transfer format in burst mode: 'binary' or 'ascii'
+    'sample_rate': 1000000,  # Digitize mode sample rate (1000 to 1000000 readings per second)
+    'aperture': 'auto',  # Digitize mode aperture in seconds (1e-6 to 1e-3), 'auto' to follow the sample rate
+    'output': None,  # CSV filename; other formats and derived files are named after it
+    'formats': ['csv'],  # Output formats, see dmm6500_writer.SINKS
+    'summary_window': 0.0,  # Summary window in seconds; 0 for none
+    'decimation': 0,  # Min/max decimation factor; 0 for none
+    'store_raw': True,  # Store raw readings besides the summary and trace
+    'trigger': None,  # Event trigger, e.g. 'level 3.0' or 'slope 5'; None stores every reading
+    'pre_trigger': 100,  # Readings kept before each event
+    'post_trigger': 100,  # Readings kept after each event
+    'rotate_rows': None,  # Start a new output segment after this many readings
+    'rotate_seconds': None,  # Start a new output segment after this many seconds of readings
+    'rotate_mb': None,  # Start a new output segment once a segment file reaches this size (in MB)
+    'resume': False,  # Continue the segments of an earlier (e.g. crashed) run instead of starting over
+    'reconnect': True,  # Reconnect after transport faults, writing gaps for the readings missed meanwhile
+    'scan': [],  # Scanner card scan list, entries 'CHANNELS[:FUNCTION[:RANGE[:NPLC]]]' such as '1-5:voltage:10:1'
+    'scan_layout': 'wide',  # Scan table layout: 'wide' (a column per channel) or 'long' (a row per reading)
+    'autotune': None,  # Instead of logging, find the fastest NPLC, auto zero and range with at most this much noise
+    'tune_ranges': [],  # Ranges the autotuner tries; none leaves the range alone
+    'shm': None,  # Publish live readings in a shared memory ring of this name (one per DMM, suffixed with its name)
+    'shm_size': 65536,  # Readings the shared memory ring holds
+    'metrics_port': None,  # Serve latency metrics on this local port (/metrics, /metrics.json); None for no endpoint
+    'metrics_file': None,  # Append a JSON line of metrics to this file every metrics_interval seconds
+    'metrics_interval': 10.0,  # Time between two metrics dumps (in seconds)
+}
+
+
+# Function to read a run config from a TOML (.toml) or YAML (.yaml, .yml) file
+def load_config_file(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.toml':
+        import tomllib  # Import tomllib (Python 3.11+) for TOML run configs
+        with open(path, 'rb') as f:
+            config = tomllib.load(f)
+    elif ext in {'.yaml', '.yml'}:
+        try:
+            import yaml  # Import PyYAML for YAML run configs
+        except ImportError:
+            raise ImportError("YAML run configs need PyYAML (pip install pyyaml)") from None
+        with open(path) as f:
+            config = yaml.safe_load(f) or {}
+    else:
+        raise ValueError(f"unknown config file format {ext!r}; use .toml, .yaml or .yml")
+    if not isinstance(config, dict):
+        raise ValueError(f"{path}: a run config is a table of settings")
+    return config
+
+
+# Function to merge config layers over the defaults and check the result; raises ValueError on bad settings
+def resolve_config(*layers):
+    config = dict(DEFAULT_CONFIG)
+    for layer in layers:
+        unknown = set(layer) - set(DEFAULT_CONFIG)
+        if unknown:
+            raise ValueError(f"unknown settings: {', '.join(sorted(unknown))}")
+        config.update((key, value) for key, value in layer.items() if value is not None)
+    for key in ('resources', 'formats'):
+        # Comma separated, as one string or in every element of a list (e.g. repeated -r options)
+        values = [config[key]] if isinstance(config[key], str) else config[key]
+        config[key] = [v.strip() for value in values for v in str(value).split(',') if v.strip()]
+
+    from dmm6500_writer import SINKS  # Import the output sinks to check the formats against
+    if str(config['function']).lower() not in MEASUREMENT_FUNCTIONS:
+        raise ValueError(f"unknown function {config['function']!r}")
+    if config['range'] is not None and config['range'] != 'auto':
+        config['range'] = float(config['range'])
+    if config['nplc'] is not None and not 0.0005 <= float(config['nplc']) <= 12.0:
+        raise ValueError("nplc must be between 0.0005 and 12")
+    config['scan'] = [_scan_entry(entry) for entry in config['scan']]
+    if config['scan'] and config['mode'] == 'interval':
+        config['mode'] = 'scan'  # A scan list implies a scan; its interval is the time between scans
+    if config['mode'] not in {'interval', 'burst', 'scan', 'digitize'}:
+        raise ValueError(f"unknown acquisition mode {config['mode']!r}")
+    if config['transfer'] not in {'binary', 'ascii'}:
+        raise ValueError(f"unknown transfer format {config['transfer']!r}")
+    if config['interval'] <= 0 and not (config['mode'] == 'scan' and config['interval'] == 0):
+        raise ValueError("interval must be positive")
+    if config['autotune'] is not None:
+        # Tuning takes its own readings and writes no output
+        if config['autotune'] <= 0:
+            raise ValueError("autotune resolution must be positive")
+        config['tune_ranges'] = [v if v == 'auto' else float(v) for v in config['tune_ranges']]
+        return config
+    if (config['samples'] is None) == (config['duration'] is None):
+        raise ValueError("give either samples or duration")
+    if config['duration'] is not None:
+        if config['mode'] != 'interval':
+            raise ValueError("duration needs interval mode; give samples for a burst")
+        config['samples'] = max(1, math.ceil(config['duration'] / config['interval']))
+    if config['samples'] < 1:
+        raise ValueError("samples must be at least 1")
+    if not config['output']:
+        raise ValueError("no output filename given")
+    for kind in config['formats']:
+        if kind not in SINKS:
+            raise ValueError(f"unknown output format {kind!r}; choose from {', '.join(SINKS)}")
+    if config['summary_window'] < 0:
+        raise ValueError("summary_window must not be negative")
+    if config['decimation'] != 0 and config['decimation'] < 2:
+        raise ValueError("decimation must be 0 (none) or at least 2")
+    for key in ('rotate_rows', 'rotate_seconds', 'rotate_mb'):
+        if config[key] is not None and config[key] <= 0:
+            raise ValueError(f"{key} must be positive")
+    if config['mode'] == 'scan':
+        if not config['scan']:
+            raise ValueError("scan mode needs a scan list")
+        if config['scan_layout'] not in {'wide', 'long'}:
+            raise ValueError(f"unknown scan layout {config['scan_layout']!r}")
+        if (config['formats'] != ['csv'] or config['summary_window'] or config['decimation'] or config['trigger']
+                or config_segmented(config) or config['shm']):
+            raise ValueError("scans are written as one CSV table; statistics, triggers, segments, shared memory "
+                             "and other formats don't apply")
+        config_scan_list(config)  # Checks the channels, functions and ranges
+    elif config['scan']:
+        raise ValueError(f"a scan list doesn't go with {config['mode']} mode")
+    if config['mode'] == 'digitize':
+        if str(config['function']).lower() not in DIGITIZE_FUNCTIONS:
+            raise ValueError("digitize mode measures voltage or current")
+        if config['samples'] > BURST_MAX_POINTS:
+            raise ValueError(f"at most {BURST_MAX_POINTS} readings can be digitized at once")
+        if not 1000 <= config['sample_rate'] <= 1000000:
+            raise ValueError("sample_rate must be between 1000 and 1000000")
+        if config['aperture'] != 'auto':
+            config['aperture'] = float(config['aperture'])
+            if not 1e-6 <= config['aperture'] <= 1e-3:
+                raise ValueError("aperture must be 'auto' or between 1e-6 and 1e-3")
+        if config['summary_window'] or config['decimation'] or config['trigger'] or config_segmented(config) or config['shm']:
+            raise ValueError("digitized captures are written whole; statistics, triggers, segments and shared memory don't apply")
+    if config['shm_size'] < 1:
+        raise ValueError("shm_size must be at least 1")
+    if config['metrics_port'] is not None and not 0 < config['metrics_port'] < 65536:
+        raise ValueError("metrics_port must be between 1 and 65535")
+    if config['metrics_interval'] <= 0:
+        raise ValueError("metrics_interval must be positive")
+    if config['pre_trigger'] < 0 or config['post_trigger'] < 0:
+        raise ValueError("pre_trigger and post_trigger must not be negative")
+    if config['trigger']:
+        if not config['store_raw'] and (config['summary_window'] or config['decimation']):
+            # Without raw output there is nothing for the trigger to select readings for
+            raise ValueError("an event trigger selects raw readings to store; it doesn't go with store_raw = false")
+        fields = config['trigger'].split()
+        if len(fields) != 2 or fields[0] not in {'level', 'slope'}:
+            raise ValueError(f"bad event trigger {config['trigger']!r}; use e.g. 'level 3.0' or 'slope 5'")
+        float(fields[1])
+    return config
+
+
+# Function to get the Function a config measures
+def config_function(config):
+    return MEASUREMENT_FUNCTIONS[str(config['function']).lower()]
+
+
+# Function to get the DigitizeFunction a digitize mode config samples
+def config_digitize_function(config):
+    return DIGITIZE_FUNCTIONS[str(config['function']).lower()]
+
+
+# Function to get the instrument settings of a config, in the form apply_settings() takes
+def config_settings(config):
+    settings = {'function': config_function(config)}
+    for key in ('range', 'nplc', 'auto_zero'):
+        if config[key] is not None:
+            settings[key] = config[key]
+    return settings
+
+
+# Function to normalize a scan list entry, given as a 'CHANNELS[:FUNCTION[:RANGE[:NPLC]]]' string or as a table
+# with channels, function, range and nplc keys (e.g. in a TOML or YAML run config), to the string form
+def _scan_entry(entry):
+    if isinstance(entry, dict):
+        unknown = set(entry) - {'channels', 'function', 'range', 'nplc'}
+        if unknown or 'channels' not in entry:
+            raise ValueError(f"bad scan list entry {entry!r}")
+        fields = [str(entry['channels']), str(entry.get('function', 'voltage')),
+                  str(entry.get('range', '')), str(entry.get('nplc', ''))]
+        entry = ':'.join(fields).rstrip(':')
+    return str(entry)
+
+
+# Function to build the ScanList of a config
+def config_scan_list(config):
+    scan_list = ScanList()
+    for entry in config['scan']:
+        channels, function, range_, nplc = (entry.split(':') + [''] * 3)[:4]
+        if (function or 'voltage').lower() not in MEASUREMENT_FUNCTIONS:
+            raise ValueError(f"unknown function {function!r} in scan list entry {entry!r}")
+        scan_list.add(parse_channels(channels), MEASUREMENT_FUNCTIONS[(function or 'voltage').lower()],
+                      None if not range_ else 'auto' if range_ == 'auto' else float(range_),
+                      float(nplc) if nplc else None)
+    return scan_list
+
+
+# Function to list the SCPI commands that set up the instruments for a config, e.g. for a dry run
+def setup_commands(config):
+    if config['mode'] == 'scan':
+        batch = CommandBatch(None)  # Only collects the commands
+        config_scan_list(config).configure(batch)
+        return batch.commands
+    if config['mode'] == 'digitize':
+        batch = CommandBatch(None)  # Only collects the commands; the capture adds its buffer and trigger setup
+        batch.add('set_digitize_function', config_digitize_function(config))
+        batch.add('set_sample_rate', config['sample_rate'])
+        batch.add('set_aperture', config['aperture'])
+        if config['range'] is not None:
+            batch.add('set_range', config['range'])
+        return batch.commands
+    mm_state = str(config_function(config))
+    return [compiled_commands[f'set_{key}'].text(mm_state, [value])[1] for key, value in config_settings(config).items()]
+
+
+# Function to write a resolved config as TOML, so a run can be repeated with --config
+def format_config(config):
+    def value(v):
+        if isinstance(v, bool):
+            return 'true' if v else 'false'
+        if isinstance(v, (list, tuple)):
+            return '[' + ', '.join(value(x) for x in v) + ']'
+        if isinstance(v, str):
+            return '"' + v.replace('\\', '\\\\').replace('"', '\\"') + '"'
+        return repr(v)
+    return ''.join(f'{key} = {value(v)}\n' for key, v in config.items() if v is not None)
+
+
+# Function to tell whether a config writes segmented output
+def config_segmented(config):
+    return bool(config['rotate_rows'] or config['rotate_seconds'] or config['rotate_mb'] or config['resume'])
+
+
+# Function to build the command-line interface; options left out fall back to the config file, then the defaults
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description='Log readings from one or more Keithley DMM6500 multimeters. '
+                    'Without arguments the settings are asked for interactively.')
+    parser.add_argument('-c', '--config', help='run config file (.toml, .yaml or .yml)')
+    parser.add_argument('-r', '--resource', dest='resources', action='append',
+                        help="resource address; repeat for several DMMs, 'all' to discover, SIM::<n>::INSTR to simulate")
+    parser.add_argument('-f', '--function', help=f"measurement function ({', '.join(MEASUREMENT_FUNCTIONS)})")
+    parser.add_argument('--range', help="measurement range, 'auto' or a number")
+    parser.add_argument('--nplc', type=float, help='integration time in power line cycles')
+    parser.add_argument('--auto-zero', action=argparse.BooleanOptionalAction, help='auto zero on or off')
+    parser.add_argument('-n', '--samples', type=int, help='number of readings per instrument')
+    parser.add_argument('-d', '--duration', type=float, help='run length in seconds (interval mode)')
+    parser.add_argument('-i', '--interval', type=float, help='time between samples in seconds (default 1)')
+    parser.add_argument('-m', '--mode', choices=['interval', 'burst', 'scan', 'digitize'], help='acquisition mode (default interval)')
+    parser.add_argument('--transfer', choices=['binary', 'ascii'], help='buffer transfer format in burst mode (default binary)')
+    parser.add_argument('--sample-rate', type=int, help='digitize mode sample rate in readings per second (default 1000000)')
+    parser.add_argument('--aperture', help="digitize mode aperture in seconds, or 'auto' (default)")
+    parser.add_argument('-o', '--output', help='CSV filename; other output files are named after it')
+    parser.add_argument('--format', dest='formats', action='append', help='output format; repeat for several (default csv)')
+    parser.add_argument('--summary-window', type=float, help='write summary rows per window of this many seconds')
+    parser.add_argument('--decimation', type=int, help='write a min/max decimated trace with this factor')
+    parser.add_argument('--no-raw', dest='store_raw', action='store_false', default=None,
+                        help='only write the summary and trace, not the raw readings')
+    parser.add_argument('--trigger', help="only store readings around events, e.g. 'level 3.0' or 'slope 5'")
+    parser.add_argument('--pre-trigger', type=int, help='readings kept before each event (default 100)')
+    parser.add_argument('--post-trigger', type=int, help='readings kept after each event (default 100)')
+    parser.add_argument('--rotate-rows', type=int, help='write segments of at most this many readings')
+    parser.add_argument('--rotate-seconds', type=float, help='write segments spanning at most this many seconds')
+    parser.add_argument('--rotate-mb', type=float, help='write segments of about this many MB')
+    parser.add_argument('--resume', action='store_true', default=None,
+                        help='append new segments to the output of an earlier run')
+    parser.add_argument('--no-reconnect', dest='reconnect', action='store_false', default=None,
+                        help='stop at the first failed measurement or transfer instead of reconnecting')
+    parser.add_argument('--scan', action='append',
+                        help="scan list entry CHANNELS[:FUNCTION[:RANGE[:NPLC]]], e.g. '1-5:voltage:10:1'; repeat for more")
+    parser.add_argument('--scan-layout', choices=['wide', 'long'], help='scan table with a column per channel (default) or a row per reading')
+    parser.add_argument('--profile', help='apply the settings of a tuned profile; with --autotune, where to write it')
+    parser.add_argument('--autotune', type=float, metavar='RESOLUTION',
+                        help='find the fastest NPLC, auto zero and range with at most this much noise instead of logging')
+    parser.add_argument('--tune-range', dest='tune_ranges', action='append',
+                        help="range the autotuner tries, a number or 'auto'; repeat for several")
+    parser.add_argument('--shm', help='publish live readings in a shared memory ring of this name for local readers')
+    parser.add_argument('--shm-size', type=int, help='readings the shared memory ring holds (default 65536)')
+    parser.add_argument('--metrics-port', type=int, help='serve latency metrics on this local port')
+    parser.add_argument('--metrics-file', help='append a JSON line of latency metrics to this file periodically')
+    parser.add_argument('--metrics-interval', type=float, help='seconds between two metrics dumps (default 10)')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='print the resolved config and setup commands without connecting')
+    return parser
+
+
+# Function to turn parsed command-line arguments into a resolved config
+def config_from_args(args):
+    layers = [load_config_file(args.config)] if args.config else []
+    # A profile goes between the config file and the options; when tuning it is written instead of read
+    if args.profile and args.autotune is None and not any(layer.get('autotune') for layer in layers):
+        layers.append(load_profile(args.profile))
+    elif args.profile and os.path.splitext(args.profile)[1].lower() not in {'.toml', '.yaml', '.yml'}:
+        # Refused before the sweep rather than once it is done
+        raise ValueError(f"can't write a profile to {args.profile}; use .toml, .yaml or .yml")
+    layers.append({key: getattr(args, key) for key in DEFAULT_CONFIG})
+    return resolve_config(*layers)
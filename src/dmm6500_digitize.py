@@ -0,0 +1,74 @@
+# Import necessary libraries and modules
+import os  # Import os for trimming a capture file that was not filled
+import time  # Import time module for host timestamps
+import numpy as np  # Import NumPy for the preallocated capture arrays
+from dmm6500_scpi import (MMResourceType, BUFFER_MIN_POINTS, BURST_MAX_POINTS, CommandBatch,
+                          DigitizeFunction)  # Import the SCPI command layer
+from dmm6500_acquisition import stream_buffer  # Import the buffer streaming shared with burst acquisition
+
+DIGITIZE_CHUNK_SIZE = 100000  # Readings fetched per binary transfer while digitizing (1.6 MB)
+DIGITIZE_POLL_INTERVAL = 0.01  # Time between buffer polls; at 1 MS/s the buffer grows by 10000 readings meanwhile
+
+
+# Function to configure the instrument to digitize `count` readings at `rate` readings per second on one trigger,
+# with binary transfers. Raises RuntimeError if the instrument rejects the setup.
+def configure_digitize(r: MMResourceType, function: DigitizeFunction, rate, count, aperture='auto', range=None):
+    batch = CommandBatch(r)  # All of the setup goes out in one transfer
+    batch.add('abort')  # Make sure no trigger model is still running
+    batch.add('set_digitize_function', function)  # The sense settings below follow this function
+    batch.add('set_sample_rate', rate)
+    batch.add('set_aperture', aperture)
+    if range is not None:
+        batch.add('set_range', range)
+    batch.add('set_digitize_count', count)
+    batch.add('set_buffer_size', max(count, BUFFER_MIN_POINTS))
+    batch.add('clear_buffer')
+    batch.add('load_simple_loop', 1, 0)  # A single trigger takes every reading
+    batch.add('set_data_format', 'REAL')
+    batch.add('set_byte_order', 'SWAP')
+    errors = batch.send()
+    if errors:
+        raise RuntimeError('digitize setup failed: ' + '; '.join(f'{code}, {message}' for code, message in errors))
+
+
+# Function to digitize `count` readings and stream them off the instrument in chunks while the buffer fills.
+# The (time, reading) pairs, with epoch times, go straight into `out`: a preallocated (count, 2) float64 array, or
+# if None a new one, or with a filename a memory-mapped file in the memmap sink's layout (so open_dataset reads it).
+# Returns the filled part of `out`, which is shorter than count if the instrument stopped early. A file is cut to
+# the readings it got, also when the capture fails.
+def digitize(r: MMResourceType, function: DigitizeFunction, rate, count, out=None, filename=None, aperture='auto',
+             range=None, chunk_size=DIGITIZE_CHUNK_SIZE, progress=None):
+    if count > BURST_MAX_POINTS:
+        raise ValueError(f'at most {BURST_MAX_POINTS} readings can be digitized at once')
+    mapped = out is None and filename is not None  # Whether out maps a file this function created
+    if out is None:
+        if filename is not None:
+            out = np.memmap(filename, dtype='<f8', mode='w+', shape=(count, 2))
+        else:
+            out = np.empty((count, 2))
+    elif out.shape != (count, 2):
+        raise ValueError(f'out has shape {out.shape}, expected {(count, 2)}')
+
+    taken = 0
+    try:
+        configure_digitize(r, function, rate, count, aperture, range)
+        start_time = time.time()  # Host time at which digitizing was started
+        for chunk in stream_buffer(r, str(function), count, chunk_size, DIGITIZE_POLL_INTERVAL, binary=True):
+            block = out[taken:taken + len(chunk)]
+            block[:] = chunk
+            block[:, 0] += start_time  # Relative times to host epoch times
+            taken += len(chunk)
+            if progress is not None:
+                progress(len(chunk))
+    finally:
+        if isinstance(out, np.memmap):
+            out.flush()
+        if mapped and taken < count:
+            # Unfilled records would read as readings. The mapping goes first: a mapped file can't be cut on Windows.
+            block = out = None
+            os.truncate(filename, taken * 16)
+            if taken:
+                out = np.memmap(filename, dtype='<f8', mode='r+', shape=(taken, 2))
+            else:
+                out = np.empty((0, 2))
+    return out[:taken]
@@ -0,0 +1,142 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from dmm6500_scpi import (MMResourceType, BURST_CHUNK_SIZE, CommandBatch, SettingsCache, all_query_templates,
+                          compiled_commands, do_query)
+from dmm6500_acquisition import burst_readings, fetch_buffer_binary
+
+
+# Attribute-style driver, e.g. dmm.function = Function.DC_VOLTAGE; dmm.nplc = 1; dmm.measure().
+# Settings the instrument already has (according to the client-side SettingsCache) are not written again.
+class DMM6500:
+    def __init__(self, resource: MMResourceType, cache=True):
+        self.r = resource
+        self.last_selected_function = None
+        self.settings = SettingsCache() if cache else None
+
+    def __setattr__(self, key: str, value):
+        if key in {'function', 'digitize_function'}:
+            self.last_selected_function = value
+
+        set_query_name = f'set_{key}'
+        if set_query_name in all_query_templates:
+            self.query(set_query_name, value)
+        else:
+            self.__dict__[key] = value
+
+    def __getattr__(self, key: str):
+        if key in all_query_templates:
+            return lambda *args: self.query(key, *args)
+        raise AttributeError(key)
+
+    # Run any template by name, skipping settings that wouldn't change anything
+    def query(self, template_name, *args):
+        command = compiled_commands[template_name]
+        if self.settings is not None and command.query_type == 'write':
+            cmd = command.text(self.last_selected_function, list(args))[1]
+            if not self.settings.update(command, self.last_selected_function, cmd):
+                return None
+        try:
+            result = do_query(self.r, template_name, self.last_selected_function, args)
+        except Exception:
+            if self.settings is not None:
+                self.settings.invalidate()  # The setting recorded above may never have arrived
+            raise
+        if template_name == 'system_error_next' and result[0] != 0 and self.settings is not None:
+            self.settings.invalidate()  # A setting may have been rejected
+        return result
+
+    # Apply many settings in one transfer, leaving out the ones the instrument already has
+    def apply_settings(self, settings_dict: dict):
+        batch = CommandBatch(self.r, self.last_selected_function, self.settings)
+        for key in ('function', 'digitize_function'):
+            if key in settings_dict:
+                batch.add(f'set_{key}', settings_dict[key])
+        for key, val in settings_dict.items():
+            if key not in {'function', 'digitize_function'}:
+                batch.add(f'set_{key}', val)
+        self.last_selected_function = batch.mm_state
+        return batch.send()
+
+    # Read the whole error queue in at most two round trips
+    def get_all_errors(self):
+        return CommandBatch(self.r, self.last_selected_function, self.settings).send()
+
+
+# Asyncio driver with the same surface as DMM6500, for event-loop based test executives.
+# VISA I/O is blocking, so every instrument gets its own worker thread; commands to one instrument are
+# serialized by a lock, while many instruments (and anything else on the loop) run concurrently.
+class AsyncDMM6500:
+    def __init__(self, resource: MMResourceType, cache=True):
+        self._driver = DMM6500(resource, cache)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'dmm6500-{id(self):x}')
+        self._lock = asyncio.Lock()
+
+    @property
+    def r(self):
+        return self._driver.r
+
+    @property
+    def last_selected_function(self):
+        return self._driver.last_selected_function
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, functools.partial(func, *args))
+
+    # Run any template by name, e.g. await dmm.query('set_nplc', 1)
+    async def query(self, template_name, *args):
+        async with self._lock:
+            return await self._run(self._driver.query, template_name, *args)
+
+    # Templates are available as coroutine methods, e.g. await dmm.measure(), await dmm.set_range('auto')
+    def __getattr__(self, key: str):
+        if key in all_query_templates:
+            return functools.partial(self.query, key)
+        raise AttributeError(key)
+
+    # Awaitable counterpart of the attribute assignment dmm.nplc = 1 of DMM6500
+    async def set(self, key, value):
+        async with self._lock:
+            await self._run(setattr, self._driver, key, value)
+
+    async def apply_settings(self, settings_dict: dict):
+        async with self._lock:
+            return await self._run(self._driver.apply_settings, settings_dict)
+
+    async def get_all_errors(self):
+        async with self._lock:
+            return await self._run(self._driver.get_all_errors)
+
+    # Fetch a range of readings from the reading buffer, as an (n, 2) array (binary) or (time, reading) pairs (ASCII).
+    # The binary transfer expects set_data_format('REAL') and set_byte_order('SWAP') to have been applied.
+    async def read_buffer(self, start, end, binary=True):
+        async with self._lock:
+            if binary:
+                return await self._run(fetch_buffer_binary, self.r, self.last_selected_function, start, end)
+            return await self._run(do_query, self.r, 'buffer_data', self.last_selected_function, [start, end])
+
+    # Buffered burst as an async generator of chunks; the instrument is held for the whole burst
+    async def burst(self, count, chunk_size=BURST_CHUNK_SIZE, binary=True):
+        done = object()
+        async with self._lock:
+            chunks = burst_readings(self.r, self.last_selected_function, count, chunk_size, binary=binary)
+            try:
+                while True:
+                    chunk = await self._run(next, chunks, done)
+                    if chunk is done:
+                        break
+                    yield chunk
+            finally:
+                await self._run(chunks.close)
+
+    async def close(self):
+        async with self._lock:
+            await self._run(self.r.close)
+        self._executor.shutdown()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
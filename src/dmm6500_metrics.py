@@ -0,0 +1,189 @@
+# Import necessary libraries and modules
+import bisect  # Import bisect for finding histogram buckets
+import json  # Import json for the stats dump and the JSON endpoint
+import threading  # Import threading for the reporter and endpoint threads and the counter locks
+import time  # Import time module for uptime and the dump interval
+
+# Upper bounds of the latency histogram buckets (in seconds): 10 per decade from 1 us to 100 s
+LATENCY_BUCKETS = [round(10 ** (e / 10), 12) for e in range(-60, 21)]
+
+# Metrics collected while instrumentation is enabled; None keeps the hot paths free of any timing.
+# do_query, CommandBatch, the binary buffer transfer and the writers check this before recording anything.
+active = None
+
+
+# Latency histogram with fixed logarithmic buckets; records are thread safe
+class LatencyHistogram:
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # The last bucket holds everything above the largest bound
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+            self.count += 1
+            self.total += seconds
+            self.min = min(self.min, seconds)
+            self.max = max(self.max, seconds)
+
+    # Latency below which a fraction q of the records fall, to the resolution of the buckets
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(self.bounds + [self.max], self.counts):
+            seen += n
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self):
+        return {'count': self.count, 'mean': self.total / self.count if self.count else 0.0,
+                'min': self.min if self.count else 0.0, 'p50': self.quantile(0.5), 'p90': self.quantile(0.9),
+                'p99': self.quantile(0.99), 'max': self.max}
+
+
+# Registry of latency histograms, counters and gauge sources
+class Metrics:
+    def __init__(self):
+        self.started = time.time()
+        self.histograms = {}  # (stage, name) -> LatencyHistogram, e.g. ('io', 'measure') or ('disk', 'csv')
+        self.counters = {}  # name -> count, e.g. 'readings'
+        self.sources = {}  # name -> callable returning a dict of gauges, e.g. pipeline queue depths
+        self._lock = threading.Lock()
+
+    # Record a latency; stages are 'format' (building the command), 'io' (instrument and transport),
+    # 'parse' (converting the response) and 'disk' (writing to a sink)
+    def record(self, stage, name, seconds):
+        histogram = self.histograms.get((stage, name))
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault((stage, name), LatencyHistogram())
+        histogram.record(seconds)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    # Register a callable whose dict of values is included in every snapshot, e.g. Pipeline.stats
+    def add_source(self, name, func):
+        self.sources[name] = func
+
+    # All metrics as plain data
+    def snapshot(self):
+        uptime = time.time() - self.started
+        sources = {}
+        for name, func in list(self.sources.items()):
+            try:
+                sources[name] = func()
+            except Exception as e:
+                sources[name] = {'error': str(e)}
+        return {
+            'time': time.time(),
+            'uptime': uptime,
+            'latency': {f'{stage}.{name}': h.summary() for (stage, name), h in sorted(self.histograms.items())},
+            'counters': dict(self.counters),
+            'rates': {name: n / uptime for name, n in self.counters.items()} if uptime > 0 else {},
+            'sources': sources,
+        }
+
+    # Histograms and counters in the Prometheus text exposition format
+    def prometheus(self):
+        lines = ['# TYPE dmm6500_latency_seconds histogram']
+        for (stage, name), h in sorted(self.histograms.items()):
+            labels = f'stage="{stage}",name="{name}"'
+            cumulative = 0
+            for bound, n in zip(h.bounds, h.counts):
+                cumulative += n
+                lines.append(f'dmm6500_latency_seconds_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+            lines.append(f'dmm6500_latency_seconds_bucket{{{labels},le="+Inf"}} {h.count}')
+            lines.append(f'dmm6500_latency_seconds_sum{{{labels}}} {h.total}')
+            lines.append(f'dmm6500_latency_seconds_count{{{labels}}} {h.count}')
+        for name, n in sorted(self.counters.items()):
+            lines.append(f'# TYPE dmm6500_{name}_total counter')
+            lines.append(f'dmm6500_{name}_total {n}')
+        return '\n'.join(lines) + '\n'
+
+    # Table of the latency histograms, for printing at the end of a run
+    def table(self):
+        rows = [f"{'latency':<32} {'count':>9} {'mean ms':>10} {'p50 ms':>10} {'p99 ms':>10} {'max ms':>10}"]
+        for key, s in self.snapshot()['latency'].items():
+            rows.append(f"{key:<32} {s['count']:>9} {s['mean'] * 1e3:>10.3f} {s['p50'] * 1e3:>10.3f} "
+                        f"{s['p99'] * 1e3:>10.3f} {s['max'] * 1e3:>10.3f}")
+        return '\n'.join(rows)
+
+
+# Function to turn instrumentation on (returns the Metrics being collected) or off
+def enable(metrics=None):
+    global active
+    active = metrics if metrics is not None else Metrics()
+    return active
+
+
+def disable():
+    global active
+    active = None
+
+
+# Thread writing a snapshot of the metrics as one JSON line every `interval` seconds (and once when stopped)
+class MetricsReporter(threading.Thread):
+    def __init__(self, metrics, filename, interval=10.0):
+        super().__init__(name='metrics-reporter', daemon=True)
+        self.metrics = metrics
+        self.filename = filename
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self._dump()
+        self._dump()
+
+    def _dump(self):
+        with open(self.filename, 'a') as f:
+            f.write(json.dumps(self.metrics.snapshot()) + '\n')
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+# Function to serve the metrics over HTTP on a local port: /metrics in the Prometheus text format,
+# /metrics.json as a JSON snapshot. Returns the server; call shutdown() on it to stop serving.
+def serve(metrics, port, host='127.0.0.1'):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer  # Import the HTTP server for the endpoint
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == '/metrics':
+                body, content_type = metrics.prometheus().encode(), 'text/plain; version=0.0.4'
+            elif self.path == '/metrics.json':
+                body, content_type = json.dumps(metrics.snapshot()).encode(), 'application/json'
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Keep scrapes off the console
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name='metrics-endpoint', daemon=True).start()
+    return server
@@ -0,0 +1,108 @@
+# Import necessary libraries and modules
+import queue  # Import queue for bounded thread-safe queues
+import threading  # Import threading for the sink worker threads
+import time  # Import time module for measuring blocked time
+
+# Default capacity of each sink queue (in items)
+QUEUE_SIZE = 10000
+
+# Marker put on a sink queue to stop its worker
+_STOP = object()
+
+
+# Worker thread draining a bounded queue into one sink (a callable taking one item)
+class SinkWorker(threading.Thread):
+    def __init__(self, name, sink, maxsize=QUEUE_SIZE, drop_when_full=False):
+        super().__init__(name=name, daemon=True)
+        self.sink = sink
+        self.queue = queue.Queue(maxsize)
+        self.drop_when_full = drop_when_full  # Drop items instead of blocking the producer (e.g. for console output)
+        self.processed = 0  # Items handed to the sink
+        self.dropped = 0  # Items dropped because the queue was full
+        self.blocked = 0.0  # Time the producer spent waiting for space in the queue (in seconds)
+        self.max_depth = 0  # Deepest the queue has been
+        self.error = None  # First exception raised by the sink
+
+    # Queue an item for the sink, applying backpressure or dropping it when the queue is full
+    def put(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            if self.drop_when_full:
+                self.dropped += 1
+            else:
+                start = time.monotonic()
+                self.queue.put(item)
+                self.blocked += time.monotonic() - start
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                break
+            # Keep draining after a failure so a blocked producer never deadlocks
+            if self.error is None:
+                try:
+                    self.sink(item)
+                except Exception as e:
+                    self.error = e
+            self.processed += 1
+
+    # Let the worker finish the queued items and wait for it
+    def stop(self):
+        self.queue.put(_STOP)
+        self.join()
+
+    def stats(self):
+        return {'depth': self.queue.qsize(), 'max_depth': self.max_depth, 'processed': self.processed,
+                'dropped': self.dropped, 'blocked': self.blocked}
+
+
+# Producer/consumer pipeline fanning every published item out to a set of sink workers
+class Pipeline:
+    def __init__(self):
+        self.workers = []
+
+    def add_sink(self, name, sink, maxsize=QUEUE_SIZE, drop_when_full=False):
+        worker = SinkWorker(name, sink, maxsize, drop_when_full)
+        self.workers.append(worker)
+        return worker
+
+    def start(self):
+        for worker in self.workers:
+            worker.start()
+
+    # Hand an item to every sink; raises the first sink error so acquisition doesn't continue into a broken sink
+    def publish(self, item):
+        for worker in self.workers:
+            if worker.error is not None:
+                raise worker.error
+            worker.put(item)
+
+    # Total number of items waiting across all sink queues
+    def depth(self):
+        return sum(worker.queue.qsize() for worker in self.workers)
+
+    def stats(self):
+        return {worker.name: worker.stats() for worker in self.workers}
+
+    def summary(self):
+        return ', '.join(f"{name}: max depth {s['max_depth']}, {s['dropped']} dropped, {s['blocked']:.3f} s blocked"
+                         for name, s in self.stats().items())
+
+    # Drain and stop all workers, then raise the first sink error if any
+    def close(self):
+        for worker in self.workers:
+            if worker.is_alive():
+                worker.stop()
+        for worker in self.workers:
+            if worker.error is not None:
+                raise worker.error
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
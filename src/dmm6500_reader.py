@@ -0,0 +1,298 @@
+# Import necessary libraries and modules
+import os  # Import os for file sizes and segment paths
+import time  # Import time module for converting local timestamps to epoch times
+import numpy as np  # Import NumPy for the arrays every query returns
+from dmm6500_writer import SINKS  # Import the output sinks to tell the file formats apart
+from dmm6500_segments import manifest_filename, read_manifest, select_segments  # Import the segment manifest
+from dmm6500_stats import RunningStats  # Import the running statistics used by summary queries
+
+INDEX_STRIDE = 1024  # Rows between two entries of the sparse time index of a CSV file
+SCAN_BLOCK = 1 << 24  # Bytes read at a time while indexing a CSV file
+
+# Record layout of resample() results: bin start (epoch seconds) and the statistics of the readings in the bin
+RESAMPLE_DTYPE = np.dtype([('time', '<f8'), ('count', '<i8'), ('mean', '<f8'), ('min', '<f8'), ('max', '<f8')])
+
+
+# Function to convert local-time timestamp strings, as written by format_timestamp(), into epoch times
+def parse_timestamps(strings):
+    naive = np.array(strings, dtype='datetime64[us]').astype(np.int64) / 1e6  # As if the strings were UTC
+    # Correct by the UTC offset in effect at each hour, which also handles daylight saving changes in a file
+    hours, inverse = np.unique(naive // 3600, return_inverse=True)
+    offsets = np.array([time.localtime(h * 3600).tm_gmtoff for h in hours], dtype=np.float64)
+    return naive - offsets[inverse]
+
+
+# Function to parse the bytes of complete CSV rows into an (n, 2) array of (epoch time, value)
+def _parse_rows(data):
+    rows = [line.split(',', 1) for line in data.decode().splitlines() if line]
+    if not rows:
+        return np.empty((0, 2))
+    readings = np.empty((len(rows), 2))
+    readings[:, 0] = parse_timestamps([row[0] for row in rows])
+    readings[:, 1] = np.array([row[1] for row in rows]).astype(np.float64)
+    return readings
+
+
+# Base class of the datasets: time range reads plus resampling and summaries built on them.
+# Times are epoch seconds; start is inclusive and end exclusive, None meaning the start or end of the data.
+class _Dataset:
+    # Readings between start and end as an (n, 2) array of (time, value)
+    def read(self, start=None, end=None):
+        raise NotImplementedError
+
+    def times(self, start=None, end=None):
+        return self.read(start, end)[:, 0]
+
+    def values(self, start=None, end=None):
+        return self.read(start, end)[:, 1]
+
+    # Statistics of the readings in every bin of `interval` seconds (aligned to the epoch), as RESAMPLE_DTYPE
+    # records; gap markers (NaN readings) are left out and empty bins are not returned
+    def resample(self, interval, start=None, end=None):
+        readings = self.read(start, end)
+        readings = readings[~np.isnan(readings[:, 1])]
+        if not len(readings):
+            return np.empty(0, dtype=RESAMPLE_DTYPE)
+        index = np.floor(readings[:, 0] / interval).astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, index[1:] != index[:-1]])
+        values = readings[:, 1]
+        result = np.empty(len(starts), dtype=RESAMPLE_DTYPE)
+        result['time'] = index[starts] * interval
+        result['count'] = np.diff(np.r_[starts, len(values)])
+        result['mean'] = np.add.reduceat(values, starts) / result['count']
+        result['min'] = np.minimum.reduceat(values, starts)
+        result['max'] = np.maximum.reduceat(values, starts)
+        return result
+
+    # (count, mean, min, max, standard deviation) of the readings between start and end, without gap markers
+    def summary(self, start=None, end=None):
+        values = self.values(start, end)
+        stats = RunningStats()
+        stats.update_array(values[~np.isnan(values)])
+        return stats.summary()
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+# CSV dataset (Timestamp,Value rows as written by the logger). A sparse index holding the byte offset and time of
+# every INDEX_STRIDE-th row is cached next to the file (<file>.index.npz), so a time range read seeks straight
+# to the rows it needs. The index is extended when the file has grown since, e.g. while a run is still logging.
+class CSVDataset(_Dataset):
+    def __init__(self, filename, use_cache=True):
+        self.filename = filename
+        self.index_filename = f"{filename}.index.npz"
+        with open(filename, 'rb') as f:
+            header = f.readline()
+        self.header = header.decode().strip().split(',')
+        self.column = self.header[1] if len(self.header) > 1 else 'Value'
+        self._offsets = np.empty(0, dtype=np.int64)  # Byte offset of every INDEX_STRIDE-th row
+        self._times = np.empty(0)  # Time of those rows
+        self._size = len(header)  # Bytes of complete rows covered by the index
+        self.rows = 0
+        if use_cache:
+            self._load_index()
+        indexed = self._size
+        self._update_index()
+        if use_cache and self._size != indexed:
+            try:
+                np.savez(self.index_filename, offsets=self._offsets, times=self._times, size=self._size, rows=self.rows)
+            except OSError:
+                pass  # E.g. read-only capture storage; the index is kept in memory only
+
+    def __len__(self):
+        return self.rows
+
+    def _load_index(self):
+        try:
+            cached = np.load(self.index_filename)
+        except (OSError, ValueError):
+            return
+        if int(cached['size']) > os.path.getsize(self.filename):
+            return  # The file was replaced by a shorter one
+        offsets, times = cached['offsets'], cached['times']
+        if len(offsets):
+            # A file rewritten since would most likely have another row at the last indexed offset
+            with open(self.filename, 'rb') as f:
+                f.seek(int(offsets[-1]))
+                row = _parse_rows(f.readline())
+            if not len(row) or row[0, 0] != times[-1]:
+                return
+        self._offsets, self._times = offsets, times
+        self._size, self.rows = int(cached['size']), int(cached['rows'])
+
+    # Index the rows added since the index was last brought up to date; only every INDEX_STRIDE-th row is parsed
+    def _update_index(self):
+        offsets, stamps = [self._offsets], []
+        with open(self.filename, 'rb') as f:
+            f.seek(self._size)
+            pending = b''  # Partial row at the end of the previous block
+            while True:
+                block = f.read(SCAN_BLOCK)
+                if not block:
+                    break
+                data = pending + block
+                ends = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == 10) + 1  # End of every complete row
+                if not len(ends):
+                    pending = data
+                    continue
+                starts = np.r_[0, ends[:-1]]
+                picked = starts[(self.rows + np.arange(len(starts))) % INDEX_STRIDE == 0]
+                offsets.append(self._size + picked)
+                stamps.extend(data[p:data.index(b',', p)].decode() for p in picked)
+                self.rows += len(starts)
+                self._size += int(ends[-1])
+                pending = data[ends[-1]:]
+        self._offsets = np.concatenate(offsets)
+        if stamps:
+            self._times = np.r_[self._times, parse_timestamps(stamps)]
+
+    # Byte range holding every row between start and end, from the sparse index
+    def _byte_range(self, start, end):
+        if not len(self._offsets):
+            return self._size, self._size
+        first = self._offsets[0]
+        if start is not None:
+            first = self._offsets[max(np.searchsorted(self._times, start, 'left') - 1, 0)]
+        last = self._size
+        if end is not None:
+            i = np.searchsorted(self._times, end, 'left')
+            if i < len(self._offsets):
+                last = self._offsets[i]
+        return int(first), int(last)
+
+    def read(self, start=None, end=None):
+        first, last = self._byte_range(start, end)
+        with open(self.filename, 'rb') as f:
+            f.seek(first)
+            readings = _parse_rows(f.read(max(last - first, 0)))
+        mask = np.ones(len(readings), dtype=bool)
+        if start is not None:
+            mask &= readings[:, 0] >= start
+        if end is not None:
+            mask &= readings[:, 0] < end
+        return readings[mask]
+
+
+# Memmap dataset (READING_DTYPE records); reads are views into the memory-mapped file, found by binary search
+class MemmapDataset(_Dataset):
+    def __init__(self, filename):
+        self.filename = filename
+        count = os.path.getsize(filename) // 16  # Whole records only, in case the last one is still being written
+        self._data = np.memmap(filename, dtype='<f8', mode='r', shape=(count, 2)) if count else np.empty((0, 2))
+
+    def __len__(self):
+        return len(self._data)
+
+    def read(self, start=None, end=None):
+        times = self._data[:, 0]
+        first = np.searchsorted(times, start, 'left') if start is not None else 0
+        last = np.searchsorted(times, end, 'left') if end is not None else len(times)
+        return self._data[first:last]
+
+
+# HDF5 dataset ('time' and value datasets); a strided read of 'time' serves as the sparse index (needs h5py)
+class HDF5Dataset(_Dataset):
+    def __init__(self, filename):
+        try:
+            import h5py
+        except ImportError:
+            raise ImportError('Reading HDF5 files needs h5py (pip install h5py)')
+        self.filename = filename
+        self._file = h5py.File(filename, 'r')
+        self._time = self._file['time']
+        self.column = next(name for name in self._file if name != 'time')
+        self._values = self._file[self.column]
+        self._index = self._time[::INDEX_STRIDE]
+
+    def __len__(self):
+        return self._time.shape[0]
+
+    # Exact position of time t, searching the full times only within one stride of the sparse index
+    def _position(self, t):
+        i = max(np.searchsorted(self._index, t, 'left') - 1, 0) * INDEX_STRIDE
+        window = self._time[i:i + INDEX_STRIDE + 1]
+        return i + int(np.searchsorted(window, t, 'left'))
+
+    def read(self, start=None, end=None):
+        first = self._position(start) if start is not None else 0
+        last = self._position(end) if end is not None else len(self)
+        return np.column_stack([self._time[first:last], self._values[first:last]])
+
+    def close(self):
+        self._file.close()
+
+
+# Parquet dataset; row groups outside the time range are skipped using their statistics (needs pyarrow)
+class ParquetDataset(_Dataset):
+    def __init__(self, filename):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError('Reading Parquet files needs pyarrow (pip install pyarrow)')
+        self._pa, self._pq = pa, pq
+        self.filename = filename
+        self._file = pq.ParquetFile(filename)
+        self.column = self._file.schema_arrow.names[1]
+
+    def __len__(self):
+        return self._file.metadata.num_rows
+
+    def read(self, start=None, end=None):
+        timestamp = self._pa.timestamp('us', tz='UTC')
+        filters = []
+        if start is not None:
+            filters.append(('Timestamp', '>=', self._pa.scalar(int(round(start * 1e6)), type=timestamp)))
+        if end is not None:
+            filters.append(('Timestamp', '<', self._pa.scalar(int(round(end * 1e6)), type=timestamp)))
+        table = self._pq.read_table(self.filename, filters=filters or None)
+        times = table.column('Timestamp').to_numpy().astype('datetime64[us]').astype(np.int64) / 1e6
+        return np.column_stack([times, table.column(self.column).to_numpy()])
+
+
+# Segmented output (see dmm6500_segments): only the segments overlapping the time range are opened
+class SegmentedDataset(_Dataset):
+    def __init__(self, filename):
+        self.filename = filename
+        self.manifest = read_manifest(filename)
+        self.directory = os.path.dirname(os.path.abspath(filename))
+
+    def __len__(self):
+        return sum(segment['samples'] for segment in self.manifest['segments'])
+
+    def read(self, start=None, end=None):
+        blocks = [np.empty((0, 2))]
+        for segment in select_segments(self.manifest, start, end):
+            with open_dataset(os.path.join(self.directory, segment['file'])) as dataset:
+                blocks.append(np.array(dataset.read(start, end)))
+        return np.concatenate(blocks)
+
+
+# Datasets by output sink name
+DATASETS = {
+    'csv': CSVDataset,
+    'parquet': ParquetDataset,
+    'hdf5': HDF5Dataset,
+    'memmap': MemmapDataset,
+}
+
+
+# Function to open a logged file by name; a file written as segments is opened through its manifest.
+# use_cache=False keeps a CSV file's index in memory only, e.g. for reading a capture once.
+def open_dataset(filename, use_cache=True):
+    if filename.endswith('.manifest.json'):
+        filename = filename[:-len('.manifest.json')]
+    if os.path.exists(manifest_filename(filename)):
+        return SegmentedDataset(filename)
+    ext = os.path.splitext(filename)[1].lower()
+    for kind, (_, sink_ext) in SINKS.items():
+        if ext == sink_ext:
+            return CSVDataset(filename, use_cache) if kind == 'csv' else DATASETS[kind](filename)
+    return CSVDataset(filename, use_cache)  # The example captures (src/DMM_test2, ...) have no extension
@@ -0,0 +1,121 @@
+# Import necessary libraries and modules
+import time  # Import time module for host timestamps
+from collections import namedtuple  # Import namedtuple for scan list entries
+import numpy as np  # Import NumPy for reshaping scan readings into tables
+from dmm6500_scpi import (MMResourceType, BUFFER_MIN_POINTS, BURST_MAX_POINTS, BURST_CHUNK_SIZE, CommandBatch, Function,
+                          format_channels)  # Import the SCPI command layer
+from dmm6500_acquisition import stream_buffer  # Import the buffer streaming shared with burst acquisition
+
+# A group of scanner channels sharing a function, range and NPLC; None leaves the range or NPLC setting alone
+ScanGroup = namedtuple('ScanGroup', ['channels', 'function', 'range', 'nplc'], defaults=[Function.DC_VOLTAGE, None, None])
+
+
+# Function to parse a channel list such as '1-5,7' or '1:5,7' into channel numbers
+def parse_channels(text):
+    channels = []
+    for part in str(text).replace('-', ':').split(','):
+        first, _, last = part.strip().partition(':')
+        channels.extend(range(int(first), int(last or first) + 1))
+    return channels
+
+
+# Scan list of a scanner card: channels in scan order, each with its own function, range and NPLC
+class ScanList:
+    def __init__(self, groups=()):
+        self.groups = []
+        for group in groups:
+            self.add(*group)
+
+    # Append channels to the scan list, e.g. scan.add([1, 2, 3], Function.DC_VOLTAGE, 10).add(4, Function.RESISTANCE)
+    def add(self, channels, function=Function.DC_VOLTAGE, range=None, nplc=None):
+        channels = [channels] if isinstance(channels, int) else list(channels)
+        if format_channels(self.channels + channels) is None:
+            raise ValueError(f'invalid or repeated channels in {channels}')
+        self.groups.append(ScanGroup(channels, function, range, nplc))
+        return self
+
+    # Channel numbers in scan order
+    @property
+    def channels(self):
+        return [c for group in self.groups for c in group.channels]
+
+    def __len__(self):
+        return len(self.channels)
+
+    # Queue the per-channel settings and the scan list itself on a CommandBatch
+    def configure(self, batch: CommandBatch):
+        for group in self.groups:
+            batch.add('channel_function', group.function, group.channels)  # Sense settings below follow this function
+            if group.range is not None:
+                batch.add('channel_range', group.range, group.channels)
+            if group.nplc is not None:
+                batch.add('channel_nplc', group.nplc, group.channels)
+        batch.add('create_scan', self.channels)
+
+
+# Function to configure the instrument to run a scan list `count` times, storing every reading in the buffer.
+# Scans start `interval` seconds apart (0 for back to back). Raises RuntimeError if the instrument rejects the
+# setup, e.g. without a scanner card.
+def configure_scan(r: MMResourceType, scan_list: ScanList, count, interval=0.0, binary=False):
+    batch = CommandBatch(r)  # All of the setup goes out in one transfer
+    batch.add('abort')  # Make sure no trigger model is still running
+    scan_list.configure(batch)
+    batch.add('set_scan_count', count)
+    batch.add('set_scan_interval', interval)
+    batch.add('set_buffer_size', max(count * len(scan_list), BUFFER_MIN_POINTS))
+    batch.add('clear_buffer')
+    if binary:
+        batch.add('set_data_format', 'REAL')
+        batch.add('set_byte_order', 'SWAP')
+    errors = batch.send()
+    if errors:
+        raise RuntimeError('scan setup failed: ' + '; '.join(f'{code}, {message}' for code, message in errors))
+
+
+# Function to get the column names of scan tables in the given layout
+def scan_header(scan_list: ScanList, layout='wide'):
+    if layout == 'long':
+        return ['Timestamp', 'Channel', 'Value']
+    return ['Timestamp'] + [f'CH{c}' for c in scan_list.channels]
+
+
+# Function to turn whole scans of (relative time, reading) pairs into a table.
+# 'wide' gives one row per scan (time of its first reading, then one column per channel);
+# 'long' gives one row per reading (time, channel, reading).
+def _scan_table(block, start_time, channels, layout):
+    n = len(channels)
+    if layout == 'long':
+        return np.column_stack([start_time + block[:, 0], np.tile(channels, len(block) // n), block[:, 1]])
+    return np.column_stack([start_time + block[::n, 0], block[:, 1].reshape(-1, n)])
+
+
+# Function to make a table holding one scan of gap markers (NaN readings) at epoch time t, e.g. for scans missed
+# while an instrument was disconnected
+def gap_table(t, channels, layout='wide'):
+    n = len(channels)
+    return _scan_table(np.column_stack([np.zeros(n), np.full(n, np.nan)]), t, channels, layout)
+
+
+# Function to run a scan list `count` times inside the instrument and yield the readings in bulk as tables of
+# whole scans (see _scan_table), with epoch times; long scans are split into runs that fit the reading buffer
+def scan_readings(r: MMResourceType, scan_list: ScanList, count, interval=0.0, binary=True, layout='wide'):
+    channels = scan_list.channels
+    n = len(channels)
+    chunk_size = max(BURST_CHUNK_SIZE // n, 1) * n  # Whole scans per transfer
+    remaining = count
+    while remaining > 0:
+        scans = min(remaining, BURST_MAX_POINTS // n)
+        configure_scan(r, scan_list, scans, interval, binary)
+        start_time = time.time()  # Host time at which the scan was started
+        pending = np.empty((0, 2))  # Readings of a scan that is not complete yet
+        taken = 0
+        for chunk in stream_buffer(r, None, scans * n, chunk_size, binary=binary):
+            block = np.concatenate([pending, np.asarray(chunk, dtype=np.float64).reshape(-1, 2)])
+            whole = len(block) // n * n
+            pending = block[whole:]
+            if whole:
+                taken += whole // n
+                yield _scan_table(block[:whole], start_time, channels, layout)
+        if taken < scans:
+            break  # The instrument stopped early; don't start another run
+        remaining -= scans
@@ -0,0 +1,58 @@
+# Import necessary libraries and modules
+import time  # Import time module for monotonic and wall clocks
+from collections import namedtuple  # Import namedtuple for lightweight tick records
+
+# A scheduled sample slot: its index in the schedule, the wall-clock time it fired at (epoch seconds),
+# how late it fired (seconds) and how many slots were skipped right before it
+Tick = namedtuple('Tick', ['index', 'time', 'late', 'missed'])
+
+
+# Fixed-rate scheduler built on absolute time.monotonic_ns() deadlines, so I/O latency doesn't accumulate as drift
+class IntervalScheduler:
+    def __init__(self, interval, late_threshold=None):
+        self.period_ns = int(interval * 1e9)
+        if self.period_ns <= 0:
+            raise ValueError('interval must be positive')
+        # Ticks firing later than this (in seconds) are counted as late; defaults to 10% of the interval
+        self.late_threshold_ns = int((interval * 0.1 if late_threshold is None else late_threshold) * 1e9)
+        self.ticks_fired = 0
+        self.late_ticks = 0
+        self.missed_ticks = 0
+        self.max_late = 0.0  # Worst lateness seen so far (in seconds)
+
+    # Yield a Tick for every slot of the schedule; slots that are already over when the loop gets to them are skipped
+    def ticks(self, count=None):
+        start_mono = time.monotonic_ns()
+        start_wall = time.time_ns()  # Wall-clock anchor; tick times are derived from the monotonic clock
+        index = 0
+        while count is None or index < count:
+            deadline = start_mono + index * self.period_ns
+            now = time.monotonic_ns()
+            if now < deadline:
+                time.sleep((deadline - now) / 1e9)
+                now = time.monotonic_ns()
+
+            # Skip slots whose deadlines already passed entirely so the schedule stays aligned
+            missed = (now - deadline) // self.period_ns
+            if count is not None:
+                missed = min(missed, count - index - 1)
+            if missed:
+                index += missed
+                deadline += missed * self.period_ns
+                self.missed_ticks += missed
+
+            late = now - deadline
+            if late > self.late_threshold_ns:
+                self.late_ticks += 1
+            self.max_late = max(self.max_late, late / 1e9)
+            self.ticks_fired += 1
+            yield Tick(index, (start_wall + now - start_mono) / 1e9, late / 1e9, missed)
+            index += 1
+
+    def stats(self):
+        return {'ticks': self.ticks_fired, 'missed': self.missed_ticks, 'late': self.late_ticks, 'max_late': self.max_late}
+
+    # One-line summary of the schedule keeping, for reporting at the end of a run
+    def summary(self):
+        return (f'{self.ticks_fired} ticks, {self.missed_ticks} missed, {self.late_ticks} late '
+                f'(worst {self.max_late * 1e3:.3f} ms late)')
@@ -0,0 +1,495 @@
+# Import necessary libraries and modules
+import numpy as np  # Import NumPy for the dummy binary transfer response
+import inspect  # Import inspect for reading the parameters of callable templates
+import re  # Import re module for regular expressions
+import time  # Import time module for timing commands when metrics are enabled
+from enum import Enum  # Import Enum class for creating enumeration types
+from typing import TYPE_CHECKING, Union, Callable  # Import Union and Callable for type hints
+import dmm6500_metrics  # Import the opt-in latency metrics
+
+if TYPE_CHECKING:
+    import pyvisa  # Only needed for the type hints; importing PyVISA is slow, so it happens when connecting
+
+# Define a dummy class for visa.Resource for testing purposes
+class DummyVisaResource:
+    @staticmethod
+    def write(txt):
+        print(f'scpi write: {txt}')  # Print the SCPI command sent for debugging purposes
+
+    @staticmethod
+    def query(txt):
+        print(f'scpi query: {txt}')  # Print the SCPI query sent for debugging purposes
+        return ""  # Return an empty string as a dummy response
+
+    @staticmethod
+    def query_binary_values(txt, **kwargs):
+        print(f'scpi binary query: {txt}')  # Print the SCPI binary query sent for debugging purposes
+        return np.empty(0)  # Return an empty array as a dummy response
+
+# Union type for specifying multiple types for the instrument resource
+MMResourceType = Union['pyvisa.resources.Resource', DummyVisaResource]
+
+# Define SCPI commands and their parameters using Enum
+class Function(Enum):
+    DC_VOLTAGE = 'VOLT:DC'
+    AC_VOLTAGE = 'VOLT:AC'
+    DC_CURRENT = 'CURR:DC'
+    AC_CURRENT = 'CURR:AC'
+    RESISTANCE = 'RES'
+    FOUR_WIRE_RESISTANCE = 'FRES'
+    DIODE = 'DIO'
+    CAPACITANCE = 'CAP'
+    TEMPERATURE = 'TEMP'
+    CONTINUITY = 'CON'
+    FREQUENCY = 'FREQ'
+    PERIOD = 'PER'
+    VOLTAGE_RATIO = 'VOLT:RAT'
+
+    def __str__(self):
+        return self.value
+
+# Digitize functions, which sample at a fixed rate (up to 1 MS/s) instead of integrating over power line cycles.
+# Used as the function of the sense settings (e.g. set_sample_rate, set_range) like Function members are.
+class DigitizeFunction(Enum):
+    VOLTAGE = 'DIG:VOLT'
+    CURRENT = 'DIG:CURR'
+
+    def __str__(self):
+        return self.value
+
+# Define SCPI screen commands using Enum
+class Screen(Enum):
+    HOME = 'HOME'
+    HOME_LARGE = 'HOME_LARGE_READING'
+    READING_TABLE = 'READING_TABLE'
+    GRAPH = 'GRAPH'
+    HISTOGRAM = 'HISTOGRAM'
+    SWIPE_FUNCTIONS = 'SWIPE_FUNCTIONS'
+    SWIPE_GRAPH = 'SWIPE_GRAPH'
+    SWIPE_SECONDARY = 'SWIPE_SECONDARY'
+    SWIPE_SETTINGS = 'SWIPE_SETTINGS'
+    SWIPE_STATISTICS = 'SWIPE_STATISTICS'
+    SWIPE_USER = 'SWIPE_USER'
+    SWIPE_CHANNEL = 'SWIPE_CHANNEL'
+    SWIPE_NONSWITCH = 'SWIPE_NONSWITCH'
+    SWIPE_SCAN = 'SWIPE_SCAN'
+    CHANNEL_CONTROL = 'CHANNEL_CONTROL'
+    CHANNEL_SETTINGS = 'CHANNEL_SETTINGS'
+    CHANNEL_SCAN = 'CHANNEL_SCAN'
+    PROCESSING = 'PROCESSING'
+
+    def __str__(self):
+        return self.value
+
+# String values of the enums, for constant-time validation of settings
+_FUNCTION_VALUES = frozenset(map(str, Function))
+_SCREEN_VALUES = frozenset(map(str, Screen))
+_DIGITIZE_VALUES = frozenset(map(str, DigitizeFunction))
+
+# Reading buffer limits for burst acquisition
+BUFFER_MIN_POINTS = 10  # Smallest capacity accepted by :TRAC:POIN
+BURST_MAX_POINTS = 1000000  # Largest number of readings taken in a single burst
+BURST_CHUNK_SIZE = 10000  # Number of readings fetched per :TRAC:DATA? transfer
+
+# Digitize sample rate limits (in readings per second)
+DIGITIZE_MIN_RATE = 1000
+DIGITIZE_MAX_RATE = 1000000
+
+# Define SCPI query templates
+query_templates = {
+    # Commands
+    'reset': ['*RST'],  # Reset command
+    'measure': [':MEAS?', lambda s: float(s)],  # Measure command
+
+    'clear_log': [':SYST:CLEAR'],  # Clear log command
+    'system_error_next': [':SYST:ERR:NEXT?', lambda s: _parse_log_event(s)],  # Get next system error command
+    'system_error_count': [':SYST:ERR:COUN?', lambda s: int(s)],  # Get number of errors in the error queue command
+
+    'clear_user_screen': [':DISP:CLEAR'],  # Clear user screen command
+    'display_user_text': [lambda line, text: f':DISP:USER{line}:TEXT "{text}"',  # Display user text command
+                          lambda line: line if line in {1, 2} else None,
+                          lambda text: str(text)],
+
+    # Simple queries
+    'detected_line_frequency': [':SYST:LFR?', float],  # Query detected line frequency command
+
+    # Setting of settings
+    'set_function': [':SENS:FUNC "{0}"',  # Set function command
+                     lambda val: str(val) if str(val) in _FUNCTION_VALUES else None],
+    'set_screen': [':DISP:SCREEN {0}',  # Set screen command
+                   lambda val: str(val) if str(val) in _SCREEN_VALUES else None],
+    'set_digitize_function': [':SENS:DIG:FUNC "{0}"',  # Select a digitize function instead of a measure function
+                              lambda val: str(val).split(':', 1)[1] if str(val) in _DIGITIZE_VALUES else None],
+    'set_digitize_count': [':SENS:DIG:COUN {0}',  # Set the number of readings one trigger digitizes
+                           lambda n: int(n) if int(n) >= 1 else None],
+
+    'set_range': [lambda v, mm_func: f':SENS:{mm_func}:RANG {v}' if v != 'auto' else f':SENS:{mm_func}:RANG:AUTO ON',  # Set range command
+                  lambda val: val if val == 'auto' or isinstance(val, (float, int)) else None],
+
+    # Reading buffer and trigger model (buffered burst acquisition)
+    'clear_buffer': [':TRAC:CLE "defbuffer1"'],  # Clear the default reading buffer
+    'set_buffer_size': [':TRAC:POIN {0}, "defbuffer1"',  # Set the capacity of the default reading buffer
+                        lambda n: int(n) if int(n) >= BUFFER_MIN_POINTS else None],
+    'load_simple_loop': [':TRIG:LOAD "SimpleLoop", {0}, {1}, "defbuffer1"',  # Load a trigger model taking a fixed number of readings
+                         lambda n: int(n) if int(n) >= 1 else None,
+                         lambda delay: float(delay) if float(delay) >= 0 else None],
+    'initiate': [':INIT'],  # Start the trigger model
+    'abort': [':ABOR'],  # Stop the trigger model
+    'trigger_state': [':TRIG:STAT?', lambda s: s.strip().split(';')[0]],  # Query the trigger model state (IDLE, RUNNING, ...)
+    'buffer_actual': [':TRAC:ACT? "defbuffer1"', lambda s: int(s)],  # Query the number of readings stored in the buffer
+    'buffer_data': [':TRAC:DATA? {0}, {1}, "defbuffer1", REL, READ',  # Fetch a range of readings with their relative timestamps
+                    lambda start: int(start) if int(start) >= 1 else None,
+                    lambda end: int(end) if int(end) >= 1 else None,
+                    lambda s: _parse_buffer_data(s)],
+    'set_data_format': [':FORM:DATA {0}',  # Set the transfer format of buffer readings (ASCII, REAL or SREAL)
+                        lambda val: str(val).upper() if str(val).upper() in {'ASCII', 'REAL', 'SREAL'} else None],
+    'set_byte_order': [':FORM:BORD {0}',  # Set the byte order of binary transfers (NORM is big endian, SWAP is little endian)
+                       lambda val: str(val).upper() if str(val).upper() in {'NORM', 'SWAP'} else None],
+
+    # Scanner card channels and scans (the instrument steps through the scan list by itself)
+    'channel_function': [':SENS:FUNC "{0}", (@{1})',  # Set the function of a list of channels
+                         lambda val: str(val) if str(val) in _FUNCTION_VALUES else None,
+                         lambda channels: format_channels(channels)],
+    'channel_range': [lambda v, channels, mm_func: f':SENS:{mm_func}:RANG {v}, (@{channels})' if v != 'auto'  # Set the range of a list of channels
+                      else f':SENS:{mm_func}:RANG:AUTO ON, (@{channels})',
+                      lambda val: val if val == 'auto' or isinstance(val, (float, int)) else None,
+                      lambda channels: format_channels(channels)],
+    'channel_nplc': [':SENS:{mm_func}:NPLC {0}, (@{1})',  # Set the NPLC of a list of channels
+                     lambda val: float(val) if (0.0005 <= float(val) <= 12.0) else None,
+                     lambda channels: format_channels(channels)],
+    'create_scan': [':ROUT:SCAN:CRE (@{0})',  # Replace the scan list
+                    lambda channels: format_channels(channels)],
+    'set_scan_count': [':ROUT:SCAN:COUN:SCAN {0}',  # Set the number of times the scan list is run
+                       lambda n: int(n) if int(n) >= 1 else None],
+    'set_scan_interval': [':ROUT:SCAN:INT {0}',  # Set the time from the start of one scan to the start of the next (in seconds)
+                          lambda t: float(t) if float(t) >= 0 else None],
+}
+
+# Define SCPI sense queries
+sense_queries = {
+    'set_auto_zero': ['AZER {0}', lambda val: {False: 'OFF', True: 'ON'}.get(val, None)],  # Set auto zero command
+    'set_nplc': ['NPLC {0}', lambda val: float(val) if (0.0005 <= float(val) <= 12.0) else None],  # Set NPLC command
+    'set_sample_rate': ['SRAT {0}',  # Set the sample rate of a digitize function (in readings per second)
+                        lambda val: int(val) if DIGITIZE_MIN_RATE <= int(val) <= DIGITIZE_MAX_RATE else None],
+    'set_aperture': ['APER {0}',  # Set the aperture of a digitize function (in seconds), 'auto' to follow the sample rate
+                     lambda val: 'AUTO' if val == 'auto' else float(val) if 1e-6 <= float(val) <= 1e-3 else None],
+}
+
+# Function to transform sense queries
+def _sense_queries_transform(template):
+    format_func = template[0]
+    assert isinstance(format_func, str)
+    return [':SENS:{mm_func}:' + format_func] + template[1:]
+
+# Function to combine all queries
+def _combined_queries(queries_templates, _sense_queries):
+    result = dict()
+    result.update(queries_templates)
+    result.update(dict((name, _sense_queries_transform(val)) for name, val in _sense_queries.items()))
+    return result
+
+# Function to parse log event
+def _parse_log_event(s):
+    groups = re.fullmatch(r'([+\-\d]+),"(.+)"', s.strip()).groups()
+    return int(groups[0]), groups[1]
+
+# Function to split the response to a semicolon-separated message, ignoring semicolons inside quotes
+def _split_responses(s):
+    return re.split(r';(?=(?:[^"]*"[^"]*")*[^"]*$)', s.strip())
+
+# Function to format channel numbers as a SCPI channel list, e.g. [1, 2, 3, 7] -> '1:3,7' (None if invalid)
+def format_channels(channels):
+    if isinstance(channels, int):
+        channels = [channels]
+    channels = [int(c) for c in channels]
+    if not channels or min(channels) < 1 or len(set(channels)) != len(channels):
+        return None
+    parts = []
+    start = prev = channels[0]
+    for c in channels[1:] + [None]:
+        if c is not None and c == prev + 1:
+            prev = c
+            continue
+        parts.append(f'{start}:{prev}' if prev > start else f'{start}')
+        start = prev = c
+    return ','.join(parts)
+
+# Function to parse a REL,READ buffer transfer into (relative time, reading) pairs
+def _parse_buffer_data(s):
+    values = [float(v) for v in s.strip().split(',')]
+    return list(zip(values[0::2], values[1::2]))
+
+# Function to generate query text
+def query_text(template, mm_state, values):
+    formt = template[0]
+    rest = template[1:]
+
+    if isinstance(formt, str):
+        requires_mm_state = formt.count('{mm_func}') == 1
+        no_required_args = formt.count('{') - (1 if requires_mm_state else 0)
+    else:
+        param_info = inspect.signature(formt).parameters
+        requires_mm_state = 'mm_func' in param_info
+        no_required_args = len(param_info) - (1 if requires_mm_state else 0)
+
+    parameter_convert_funcs = rest[:no_required_args]
+
+    if no_required_args != len(values):
+        raise ValueError
+
+    if len(rest) > no_required_args:
+        return_convert = rest[-1]
+    else:
+        return_convert = None
+
+    query_type = 'write' if return_convert is None else 'query'
+
+    converted_values = [f(v) for f, v in zip(parameter_convert_funcs, values)]
+    if None in converted_values:
+        raise ValueError
+
+    if isinstance(formt, str):
+        return query_type, formt.format(*converted_values, mm_func=mm_state), return_convert
+    else:
+        if requires_mm_state:
+            return query_type, formt(*converted_values, mm_func=mm_state), return_convert
+        else:
+            return query_type, formt(*converted_values), return_convert
+
+# Combine all query templates
+all_query_templates = _combined_queries(query_templates, sense_queries)
+
+# A query template compiled once: arity, mode binding, validators and return converter are worked out up front
+class Command:
+    __slots__ = ('name', 'formt', 'requires_mm_state', 'no_required_args', 'parameter_convert_funcs',
+                 'return_convert', 'query_type', 'constant_text')
+
+    def __init__(self, name, template):
+        formt = template[0]
+        rest = template[1:]
+
+        if isinstance(formt, str):
+            requires_mm_state = formt.count('{mm_func}') == 1
+            no_required_args = formt.count('{') - (1 if requires_mm_state else 0)
+        else:
+            param_info = inspect.signature(formt).parameters
+            requires_mm_state = 'mm_func' in param_info
+            no_required_args = len(param_info) - (1 if requires_mm_state else 0)
+
+        self.name = name
+        self.formt = formt
+        self.requires_mm_state = requires_mm_state
+        self.no_required_args = no_required_args
+        self.parameter_convert_funcs = tuple(rest[:no_required_args])
+        self.return_convert = rest[-1] if len(rest) > no_required_args else None
+        self.query_type = 'write' if self.return_convert is None else 'query'
+        # Commands without arguments or mode always produce the same text
+        if isinstance(formt, str) and no_required_args == 0 and not requires_mm_state:
+            self.constant_text = formt.format()
+        else:
+            self.constant_text = None
+
+    # Same contract as query_text(): returns (query type, command text, return converter)
+    def text(self, mm_state, values):
+        if self.constant_text is not None and not values:
+            return self.query_type, self.constant_text, self.return_convert
+
+        if self.no_required_args != len(values):
+            raise ValueError
+
+        converted_values = [f(v) for f, v in zip(self.parameter_convert_funcs, values)]
+        if None in converted_values:
+            raise ValueError
+
+        if isinstance(self.formt, str):
+            return self.query_type, self.formt.format(*converted_values, mm_func=mm_state), self.return_convert
+        elif self.requires_mm_state:
+            return self.query_type, self.formt(*converted_values, mm_func=mm_state), self.return_convert
+        else:
+            return self.query_type, self.formt(*converted_values), self.return_convert
+
+    def __repr__(self):
+        return f'Command({self.name!r}, {self.query_type}, args={self.no_required_args})'
+
+# Compile all query templates once at import
+compiled_commands = {name: Command(name, template) for name, template in all_query_templates.items()}
+
+# Function to execute query
+def do_query(r: MMResourceType, template_name, mm_state, args):
+    if dmm6500_metrics.active is not None:
+        return _timed_query(dmm6500_metrics.active, r, template_name, mm_state, args)
+    command = compiled_commands[template_name]
+    method, cmd, return_convert = command.text(mm_state, args)
+    if method == 'write':
+        r.write(cmd)
+        return None
+    else:
+        return return_convert(r.query(cmd))
+
+# do_query recording how long formatting the command, the instrument round trip and parsing the response took
+def _timed_query(metrics, r: MMResourceType, template_name, mm_state, args):
+    t0 = time.perf_counter()
+    method, cmd, return_convert = compiled_commands[template_name].text(mm_state, args)
+    t1 = time.perf_counter()
+    if method == 'write':
+        r.write(cmd)
+        response = None
+    else:
+        response = r.query(cmd)
+    t2 = time.perf_counter()
+    result = None if response is None else return_convert(response)
+    t3 = time.perf_counter()
+    metrics.record('format', template_name, t1 - t0)
+    metrics.record('io', template_name, t2 - t1)
+    if response is not None:
+        metrics.record('parse', template_name, t3 - t2)
+    return result
+
+# Settings the SettingsCache mirrors: the function and its sense settings. Buffer, transfer format and scan
+# settings are left out, since burst, scan and digitize change them through uncached batches.
+CACHED_SETTINGS = frozenset({'set_function', 'set_digitize_function', 'set_range', 'set_nplc', 'set_auto_zero',
+                             'set_sample_rate', 'set_aperture'})
+
+# Client-side mirror of the settings last written to the instrument, used to skip writes that change nothing.
+# Settings are keyed by template and, for sense settings, by function; the mirror is cleared whenever the
+# instrument state may differ from it (*RST, a function change, or an error).
+class SettingsCache:
+    def __init__(self):
+        self.function = None
+        self.settings = {}  # (template name, function) -> command text last sent
+        self.hits = 0  # Writes skipped because the instrument already had the setting
+
+    # Record a command about to be sent; returns False if it would change nothing and can be skipped
+    def update(self, command: Command, mm_state, cmd):
+        if command.name == 'reset':
+            self.invalidate()
+            return True
+        if command.name not in CACHED_SETTINGS:
+            return True  # Other commands (buffers, formats, triggers, display) always go out
+        if command.name == 'set_digitize_function':
+            self.function = None  # The measure function is left, so the next set_function has to go out
+        elif command.name == 'set_function':
+            if str(mm_state) == self.function:
+                self.hits += 1
+                return False
+            self.invalidate()
+            self.function = str(mm_state)
+            return True
+        key = (command.name, str(mm_state) if command.requires_mm_state else None)
+        if self.settings.get(key) == cmd:
+            self.hits += 1
+            return False
+        self.settings[key] = cmd
+        return True
+
+    # Forget everything, so the next write of every setting goes out
+    def invalidate(self):
+        self.function = None
+        self.settings.clear()
+
+    # Commands bringing an instrument back to the mirrored settings (e.g. after reconnecting), function first
+    def commands(self):
+        cmds = [compiled_commands['set_function'].text(None, [self.function])[1]] if self.function else []
+        return cmds + list(self.settings.values())
+
+# Longest message sent in one transfer when batching commands (in characters)
+MAX_MESSAGE_LENGTH = 1024
+
+# Collects write commands and sends them joined into semicolon-separated messages, checking errors once at the end
+class CommandBatch:
+    def __init__(self, r: MMResourceType, mm_state=None, cache=None):
+        self.r = r
+        self.mm_state = mm_state  # Function used by sense settings; follows set_function like DMM6500.__setattr__ does
+        self.cache = cache  # Optional SettingsCache used to drop settings the instrument already has
+        self.commands = []
+        self.skipped = 0  # Settings dropped because the instrument already has them
+
+    # Queue a write command; query templates can't be batched since their responses would be lost
+    def add(self, template_name, *args):
+        command = compiled_commands[template_name]
+        if command.query_type != 'write':
+            raise ValueError(f'{template_name} is a query and can not be batched')
+        if template_name in {'set_function', 'set_digitize_function', 'channel_function'}:
+            self.mm_state = args[0]
+        cmd = command.text(self.mm_state, list(args))[1]
+        if self.cache is None or self.cache.update(command, self.mm_state, cmd):
+            self.commands.append(cmd)
+        else:
+            self.skipped += 1
+        return self
+
+    # Queue already formatted write commands, e.g. the ones SettingsCache.commands() replays
+    def add_commands(self, cmds):
+        self.commands.extend(cmds)
+        return self
+
+    # Split the queued commands into messages no longer than MAX_MESSAGE_LENGTH
+    def messages(self):
+        messages = []
+        current = ''
+        for cmd in self.commands:
+            if current and len(current) + 1 + len(cmd) > MAX_MESSAGE_LENGTH:
+                messages.append(current)
+                current = ''
+            current = f'{current};{cmd}' if current else cmd
+        if current:
+            messages.append(current)
+        return messages
+
+    # Send all queued commands and return the errors they caused as (code, message) pairs.
+    # The error count rides along with the last message, so a clean batch costs a single round trip;
+    # any errors are fetched together in one more.
+    def send(self, check_errors=True):
+        if dmm6500_metrics.active is None:
+            return self._send(check_errors)
+        start = time.perf_counter()
+        try:
+            return self._send(check_errors)
+        finally:
+            dmm6500_metrics.active.record('io', 'batch', time.perf_counter() - start)
+
+    def _send(self, check_errors):
+        messages = self.messages()
+        self.commands = []
+        if not messages and self.skipped:
+            return []  # Every setting was a cache hit: nothing was sent, so nothing can have failed
+        try:
+            if not check_errors:
+                for message in messages:
+                    self.r.write(message)
+                return []
+
+            for message in messages[:-1]:
+                self.r.write(message)
+            last = f'{messages[-1]};:SYST:ERR:COUN?' if messages else ':SYST:ERR:COUN?'
+            count = int(_split_responses(self.r.query(last))[-1])
+        except Exception:
+            if self.cache is not None:
+                self.cache.invalidate()  # The settings recorded for this batch may never have arrived
+            raise
+        if count == 0:
+            return []
+        if self.cache is not None:
+            self.cache.invalidate()  # Some setting may not have been applied
+        responses = _split_responses(self.r.query(';'.join([':SYST:ERR:NEXT?'] * count)))
+        return [_parse_log_event(response) for response in responses]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None and self.commands:
+            self.send(check_errors=False)
+        elif self.commands and self.cache is not None:
+            self.cache.invalidate()  # The queued settings were recorded but are not sent
+
+# Function to apply a dictionary of settings (e.g. {'function': Function.DC_VOLTAGE, 'nplc': 1}) in one batch.
+# The function is set first so the sense settings apply to it. Returns the errors the settings caused.
+def apply_settings(r: MMResourceType, settings_dict: dict, mm_state=None, cache=None):
+    batch = CommandBatch(r, mm_state, cache)
+    if 'function' in settings_dict:
+        batch.add('set_function', settings_dict['function'])
+    for key, val in settings_dict.items():
+        if key != 'function':
+            batch.add(f'set_{key}', val)
+    return batch.send()
@@ -0,0 +1,181 @@
+# Import necessary libraries and modules
+import json  # Import json for the segment manifest
+import os  # Import os for atomic manifest updates and segment recovery
+import time  # Import time module for manifest update bookkeeping
+from datetime import datetime  # Import datetime for parsing CSV timestamps back into epoch times
+import numpy as np  # Import NumPy for splitting reading blocks at segment boundaries
+from dmm6500_writer import READING_DTYPE, open_sink  # Import the output sinks the segments are written with
+
+MANIFEST_INTERVAL = 1.0  # Rewrite the manifest of the open segment at most this often (in seconds)
+
+
+# Function to get the manifest file name of a segmented output, e.g. run.csv.manifest.json
+def manifest_filename(filename):
+    return f"{filename}.manifest.json"
+
+
+# Function to read the manifest of a segmented output; None if there is none yet
+def read_manifest(filename):
+    try:
+        with open(manifest_filename(filename)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+# Function to write the manifest so a crash leaves either the old or the new version, never a partial one
+def _write_manifest(filename, manifest):
+    path = manifest_filename(filename)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + '.tmp', path)
+
+
+# Function to list the segments of a manifest holding readings between start and end (epoch times, None for open)
+def select_segments(manifest, start=None, end=None):
+    return [segment for segment in manifest['segments']
+            if (end is None or segment['start_time'] is None or segment['start_time'] <= end)
+            and (start is None or segment['end_time'] is None or segment['end_time'] >= start)]
+
+
+# Function to bring a segment left open by a crash into a consistent state: a trailing partial CSV row or memmap
+# record is cut off, and the sample count and end time are read back from the file. Other formats are left as
+# they are, with the counts of the last manifest update.
+def _recover_segment(segment, directory, kind):
+    path = os.path.join(directory, segment['file'])
+    if not os.path.exists(path):
+        segment['samples'] = 0
+    elif kind == 'csv':
+        with open(path, 'rb+') as f:
+            data = f.read()
+            end = data.rfind(b'\n') + 1  # Drop everything after the last complete row
+            f.truncate(end)
+        rows = data[:end].decode().splitlines()[1:]  # Without the header
+        segment['samples'] = len(rows)
+        if rows:
+            last = datetime.strptime(rows[-1].split(',')[0], '%Y-%m-%d %H:%M:%S.%f')
+            segment['end_time'] = last.timestamp()
+    elif kind == 'memmap':
+        count = os.path.getsize(path) // READING_DTYPE.itemsize
+        os.truncate(path, count * READING_DTYPE.itemsize)  # Drop a partially written record
+        segment['samples'] = count
+        if count:
+            segment['end_time'] = float(np.memmap(path, dtype=READING_DTYPE, mode='r')[-1]['time'])
+    segment['closed'] = True
+    segment['recovered'] = True
+
+
+# Output sink writing a series of segment files (run_00000.csv, run_00001.csv, ...) instead of one growing file.
+# A segment is closed and a new one started once it holds rotate_rows readings, spans rotate_seconds of reading
+# time or reaches rotate_bytes on disk (checked as the segment's sink flushes). A JSON manifest next to the
+# segments lists every segment with its file, first sample number, sample count and first and last reading time.
+# With resume=True an existing manifest is continued: a segment a crash left open is recovered and the new
+# readings go to a new segment.
+class SegmentedSink:
+    def __init__(self, kind, filename, column, rotate_rows=None, rotate_seconds=None, rotate_bytes=None, resume=False):
+        self.kind = kind
+        self.filename = filename
+        self.column = column
+        self.rotate_rows = rotate_rows
+        self.rotate_seconds = rotate_seconds
+        self.rotate_bytes = rotate_bytes
+        self.directory = os.path.dirname(os.path.abspath(filename))
+        self._stem, self._ext = os.path.splitext(filename)
+        self._sink = None
+        self._segment = None
+        self._last_manifest = 0.0
+
+        manifest = read_manifest(filename) if resume else None
+        if manifest is None:
+            manifest = {'kind': kind, 'column': column, 'segments': []}
+        elif manifest['kind'] != kind:
+            raise ValueError(f"{manifest_filename(filename)} is a manifest of {manifest['kind']} segments, not {kind}")
+        for segment in manifest['segments']:
+            if not segment['closed']:
+                _recover_segment(segment, self.directory, kind)
+        self.manifest = manifest
+        _write_manifest(filename, manifest)
+
+    # Total number of readings in all segments, including earlier runs that were resumed
+    @property
+    def samples(self):
+        return sum(segment['samples'] for segment in self.manifest['segments']) + self._pending_samples()
+
+    def _pending_samples(self):
+        return self._segment_rows - self._segment['samples'] if self._segment is not None else 0
+
+    def _open_segment(self, start_time):
+        segments = self.manifest['segments']
+        index = segments[-1]['index'] + 1 if segments else 0
+        first_sample = self.samples
+        name = f"{os.path.basename(self._stem)}_{index:05d}{self._ext}"
+        self._sink = open_sink(self.kind, os.path.join(self.directory, name), self.column)
+        self._segment = {'index': index, 'file': name, 'first_sample': first_sample, 'samples': 0,
+                         'start_time': start_time, 'end_time': None, 'closed': False}
+        self._segment_rows = 0  # Readings handed to the segment's sink, flushed or not
+        segments.append(self._segment)
+        _write_manifest(self.filename, self.manifest)
+
+    def _close_segment(self):
+        if self._sink is None:
+            return
+        self._sink.close()
+        self._segment['samples'] = self._segment_rows
+        self._segment['end_time'] = self._end_time
+        self._segment['closed'] = True
+        self._sink = self._segment = None
+        _write_manifest(self.filename, self.manifest)
+
+    # Number of readings the open segment takes before it has to rotate
+    def _room(self, times):
+        room = len(times)
+        if self.rotate_rows:
+            room = min(room, self.rotate_rows - self._segment_rows)
+        if self.rotate_seconds:
+            room = min(room, int(np.searchsorted(times, self._segment['start_time'] + self.rotate_seconds)))
+        return room
+
+    # Queue (epoch time, value) readings given as pairs or as an (n, 2) array
+    def write_readings(self, readings):
+        block = np.asarray(readings, dtype=np.float64).reshape(-1, 2)
+        while len(block):
+            if self._sink is None:
+                self._open_segment(float(block[0, 0]))
+            room = self._room(block[:, 0])
+            if room <= 0:
+                self._close_segment()
+                continue
+            self._sink.write_readings(block[:room])
+            self._segment_rows += room
+            self._end_time = float(block[room - 1, 0])
+            block = block[room:]
+            if self.rotate_bytes and os.path.getsize(os.path.join(self.directory, self._segment['file'])) >= self.rotate_bytes:
+                self._close_segment()
+        self._maybe_update_manifest()
+
+    # Record the readings the open segment's sink has written so far, so a crash loses at most that much bookkeeping
+    def _maybe_update_manifest(self, force=False):
+        if self._segment is None:
+            return
+        written = getattr(self._sink, 'rows_written', 0)
+        now = time.monotonic()
+        if written != self._segment['samples'] and (force or now - self._last_manifest >= MANIFEST_INTERVAL):
+            self._segment['samples'] = written
+            _write_manifest(self.filename, self.manifest)
+            self._last_manifest = now
+
+    def checkpoint(self):
+        if self._sink is not None:
+            self._sink.checkpoint()
+            self._maybe_update_manifest(force=True)
+
+    def close(self):
+        self._close_segment()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
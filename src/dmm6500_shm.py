@@ -0,0 +1,196 @@
+# Import necessary libraries and modules
+import time  # Import time module for polling in follow()
+from multiprocessing import shared_memory  # Import shared_memory for the ring shared with other processes
+import numpy as np  # Import NumPy for viewing the shared memory as arrays
+
+RING_MAGIC = 0x444D4D36353030  # 'DMM6500', marks a block holding a reading ring
+RING_CAPACITY = 65536  # Default number of readings the ring holds
+LABEL_SIZE = 64  # Bytes reserved for the column name, e.g. 'Voltage'
+
+# Header fields (int64) at the start of the block; the (capacity, 2) float64 readings follow the header
+_MAGIC, _CAPACITY, _WRITTEN, _CLOSED = range(4)
+HEADER_SIZE = 4 * 8 + LABEL_SIZE
+
+_created = set()  # Names of the rings this process created (and whose unlinking the resource tracker handles)
+
+
+# Function to attach to an existing block without the resource tracker unlinking it when this process exits
+def _attach(name):
+    shm = shared_memory.SharedMemory(name=name)
+    if name in _created:
+        return shm  # The registration belongs to the SharedRing in this process
+    try:
+        from multiprocessing import resource_tracker  # Import resource_tracker to undo the registration (before Python 3.13)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    except Exception:
+        pass
+    return shm
+
+
+# Function to unmap a block; while arrays still view it (e.g. from read(copy=False)) it stays mapped until they go
+def _release(shm):
+    try:
+        shm.close()
+    except BufferError:
+        pass
+
+
+# Views of the header fields, the label and the readings of a ring block
+def _layout(shm):
+    header = np.ndarray(4, dtype='<i8', buffer=shm.buf)
+    label = shm.buf[4 * 8:HEADER_SIZE]
+    readings = np.ndarray((int(header[_CAPACITY]), 2), dtype='<f8', buffer=shm.buf, offset=HEADER_SIZE)
+    return header, label, readings
+
+
+# Single-producer ring of (epoch time, value) readings in shared memory, for live consumers in other processes.
+# Readers never take a lock or slow the writer down: the writer copies readings in and then advances the
+# count of readings written, and a reader that falls more than a ring behind detects the overrun from that count.
+# Works as a pipeline sink (write_readings) like the file writers.
+class SharedRing:
+    def __init__(self, name, capacity=RING_CAPACITY, label='Value'):
+        self.name = name
+        self.capacity = capacity
+        self._shm = shared_memory.SharedMemory(name=name, create=True, size=HEADER_SIZE + capacity * 16)
+        _created.add(name)
+        np.ndarray(4, dtype='<i8', buffer=self._shm.buf)[_CAPACITY] = capacity
+        self._header, label_buf, self._readings = _layout(self._shm)
+        encoded = label.encode()[:LABEL_SIZE]
+        label_buf[:len(encoded)] = encoded
+        self._header[_MAGIC] = RING_MAGIC  # Written last, so readers never see a half-initialized header
+
+    @property
+    def written(self):
+        return int(self._header[_WRITTEN])
+
+    # Append readings given as pairs or as an (n, 2) array; beyond a ring's worth only the newest are kept
+    def write_readings(self, readings):
+        block = np.asarray(readings, dtype=np.float64).reshape(-1, 2)
+        n = len(block)
+        if not n:
+            return
+        written = int(self._header[_WRITTEN])
+        if n > self.capacity:
+            written += n - self.capacity
+            block = block[-self.capacity:]
+        start = written % self.capacity
+        first = min(len(block), self.capacity - start)
+        self._readings[start:start + first] = block[:first]
+        self._readings[:len(block) - first] = block[first:]
+        self._header[_WRITTEN] = written + len(block)  # Publish only once the readings are in place
+
+    # Tell readers no more readings will come and remove the block; attached readers keep their mapping
+    def close(self):
+        if self._shm is None:
+            return
+        self._header[_CLOSED] = 1
+        self._header = self._readings = None
+        self._shm.unlink()
+        _created.discard(self.name)
+        _release(self._shm)
+        self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+# Reader of a SharedRing in another (or the same) process. Reads return the readings added since the last read;
+# readings the writer overwrote before they were read are counted in `lost` (and `overruns` counts the reads
+# that found such a gap). By default reading starts with the next reading written; from_start=True starts with
+# the oldest one still in the ring.
+class RingSubscriber:
+    def __init__(self, name, from_start=False):
+        self.name = name
+        self._shm = _attach(name)
+        header = np.ndarray(4, dtype='<i8', buffer=self._shm.buf)
+        if header[_MAGIC] != RING_MAGIC:
+            self._shm.close()
+            raise ValueError(f'{name} is not a DMM6500 reading ring')
+        self._header, label_buf, self._readings = _layout(self._shm)
+        self.capacity = len(self._readings)
+        self.label = bytes(label_buf).rstrip(b'\0').decode()
+        written = int(self._header[_WRITTEN])
+        self.position = max(written - self.capacity, 0) if from_start else written  # Index of the next reading to read
+        self.lost = 0  # Readings overwritten before they were read
+        self.overruns = 0  # Reads that found readings missing
+        self._view_start = None
+
+    # Readings written but not read yet
+    @property
+    def lag(self):
+        return int(self._header[_WRITTEN]) - self.position
+
+    @property
+    def closed(self):
+        return bool(self._header[_CLOSED])
+
+    def _skip_lost(self, written):
+        oldest = written - self.capacity
+        if self.position < oldest:
+            self.lost += oldest - self.position
+            self.overruns += 1
+            self.position = oldest
+
+    # New readings as an (n, 2) array of (epoch time, value), at most max_readings of them.
+    # copy=False returns a view into the shared memory instead (zero copies); a view stops at the end of the
+    # ring, the rest comes with the next read, and valid() tells whether the writer has overwritten it since.
+    def read(self, max_readings=None, copy=True):
+        written = int(self._header[_WRITTEN])
+        self._skip_lost(written)
+        end = written if max_readings is None else min(written, self.position + max_readings)
+        start = self.position % self.capacity
+        if not copy:
+            end = min(end, self.position + self.capacity - start)
+            block = self._readings[start:start + end - self.position]
+            self._view_start = self.position
+            self.position = end
+            return block
+        n = end - self.position
+        first = min(n, self.capacity - start)
+        block = np.concatenate([self._readings[start:start + first], self._readings[:n - first]])
+        # Readings the writer overwrote while they were copied are dropped from the front of the block
+        overwritten = min(int(self._header[_WRITTEN]) - self.capacity - self.position, n)
+        if overwritten > 0:
+            block = block[overwritten:]
+            self.lost += overwritten
+            self.overruns += 1
+        self.position = end
+        return block
+
+    # Whether the view returned by the last read(copy=False) still holds the readings it was read with
+    def valid(self):
+        return self._view_start is None or int(self._header[_WRITTEN]) - self.capacity <= self._view_start
+
+    # Copy of the newest n readings, without moving the read position (e.g. for redrawing a plot)
+    def latest(self, n):
+        written = int(self._header[_WRITTEN])
+        n = min(n, written, self.capacity)
+        indices = np.arange(written - n, written) % self.capacity
+        return self._readings[indices]
+
+    # Yield blocks of new readings until the writer closes the ring
+    def follow(self, poll_interval=0.05, max_readings=None):
+        while True:
+            closed = self.closed  # Checked before reading, so the readings written before closing are not missed
+            block = self.read(max_readings)
+            if len(block):
+                yield block
+            elif closed:
+                return
+            else:
+                time.sleep(poll_interval)
+
+    def close(self):
+        if self._shm is not None:
+            self._header = self._readings = None
+            _release(self._shm)
+            self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
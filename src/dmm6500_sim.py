@@ -0,0 +1,319 @@
+# Import necessary libraries and modules
+import math  # Import math for the default waveform
+import re  # Import re module for parsing SCPI commands
+import time  # Import time module for simulated latency and trigger timing
+import numpy as np  # Import NumPy for generating buffered readings in bulk
+
+# Round-trip latency of one query per transport (in seconds)
+TRANSPORT_LATENCY = {
+    'USB': 0.0005,
+    'TCPIP': 0.001,
+    'GPIB': 0.002,
+}
+
+# Relay switching and settling time per scanner channel (in seconds)
+SCAN_SWITCH_TIME = 0.004
+
+# Errors the simulator can report through :SYST:ERR:NEXT?
+UNDEFINED_HEADER = (-113, 'Undefined header')
+PARAMETER_OUT_OF_RANGE = (-222, 'Parameter data out of range')
+
+
+# Default synthetic signal, shaped like the captures in src/DMM_test2: a ~13 s oscillation
+# between roughly 1.35 V and 2.1 V with a 3.26 V spike every 26 s
+def default_waveform(t):
+    t = np.asarray(t, dtype=np.float64)
+    base = 1.72 + 0.38 * np.sin(2 * math.pi * t / 13.0)
+    return np.where(t % 26.0 < 0.5, 3.26, base)
+
+
+# Simulated Keithley DMM6500 speaking the SCPI subset used by the logger, usable wherever a pyvisa resource is
+class SimulatedDMM6500:
+    def __init__(self, resource_name='SIM::DMM6500::INSTR', serial='SIM00001', waveform=default_waveform,
+                 noise=1e-4, line_frequency=50.0, transport=None, latency=None, time_scale=1.0, seed=0, fault_rate=0.0):
+        self.resource_name = resource_name
+        self.serial = serial
+        self.waveform = waveform  # Callable mapping time (seconds, array) to readings
+        self.noise = noise  # Reading noise (standard deviation) at 1 NPLC; scales with 1/sqrt(NPLC)
+        self.line_frequency = line_frequency
+        if latency is None:
+            latency = TRANSPORT_LATENCY.get(transport or resource_name.split('::')[0], TRANSPORT_LATENCY['USB'])
+        self.latency = latency  # Round-trip latency of one query (in seconds)
+        self.time_scale = time_scale  # Multiplies every simulated delay; 0 makes the simulator run as fast as possible
+        self.fault_rate = fault_rate  # Probability of a transport timeout on any single transfer
+        self.online = True  # Set to False to simulate an unplugged cable; every transfer then times out
+        self.timeout = 500
+        self.write_count = 0
+        self.query_count = 0
+        self._rng = np.random.default_rng(seed)
+        self._fault_rng = np.random.default_rng(seed + 1)
+        self._epoch = time.monotonic()
+        self.errors = []  # Error queue; *RST leaves it alone like the real instrument
+        self.reset()
+
+    # Restore the power-on settings (*RST)
+    def reset(self):
+        self.function = 'VOLT:DC'
+        self.nplc = {}  # Per-function settings; missing entries use the defaults below
+        self.auto_zero = {}
+        self.range = {}
+        self.digitize_function = None  # 'DIG:VOLT' or 'DIG:CURR' while a digitize function is selected
+        self.sample_rate = {}  # Per digitize function settings
+        self.aperture = {}
+        self.digitize_count = 1
+        self.data_format = 'ASCII'
+        self.byte_order = 'NORM'
+        self.buffer_capacity = 100000
+        self._buffer_times = np.empty(0)
+        self._buffer_values = np.empty(0)
+        self._loop_count = 0  # Triggers of the loaded simple loop
+        self._trigger_count = 0  # Readings the loaded trigger model takes
+        self._trigger_delay = 0.0
+        self._trigger_start = None
+        self._trigger_state = 'IDLE'
+        self._schedule = np.empty(0)  # Time of every reading of the running trigger model, relative to its start
+        self._schedule_offsets = np.empty(0)  # Per-reading signal offset (channels of a scan read distinct signals)
+        # Scanner card: per-channel settings and the scan list
+        self.channel_function = {}
+        self.channel_nplc = {}
+        self.channel_range = {}
+        self.scan_list = []
+        self.scan_count = 1
+        self.scan_interval = 0.0
+        self._scan_loaded = False  # The scan replaces the trigger model until another one is loaded
+
+    # Time one reading takes with the current settings (in seconds), of the front inputs or of a scanner channel
+    def reading_time(self, channel=None):
+        if channel is None and self.digitize_function:
+            return 1.0 / self.sample_rate.get(self.digitize_function, 1000000)
+        if channel is None:
+            nplc, auto_zero = self.nplc.get(self.function, 1.0), self.auto_zero.get(self.function, True)
+        else:
+            nplc, auto_zero = self.channel_nplc.get(channel, 1.0), True
+        # Auto zero takes a reference and a zero measurement alongside every reading
+        return nplc / self.line_frequency * (3 if auto_zero else 1) + 50e-6
+
+    # Reading times of the loaded trigger model: a simple loop, or scan_count runs through the scan list
+    def _build_schedule(self):
+        if not self._scan_loaded and self.digitize_function:
+            # Every trigger digitizes digitize_count readings at the sample rate
+            self._trigger_count = self._loop_count * self.digitize_count
+            self._schedule = np.arange(self._trigger_count) * self.reading_time()
+            self._schedule_offsets = np.zeros(self._trigger_count)
+            return
+        if not self._scan_loaded:
+            self._trigger_count = self._loop_count
+            self._schedule = np.arange(self._trigger_count) * (self.reading_time() + self._trigger_delay)
+            self._schedule_offsets = np.zeros(self._trigger_count)
+            return
+        steps = np.array([self.reading_time(c) + SCAN_SWITCH_TIME for c in self.scan_list])
+        period = max(self.scan_interval, steps.sum())
+        within = np.r_[0.0, np.cumsum(steps)[:-1]]
+        self._schedule = (np.arange(self.scan_count)[:, None] * period + within).ravel()
+        self._schedule_offsets = np.tile(0.1 * (np.array(self.scan_list) - 1), self.scan_count)
+        self._trigger_count = len(self._schedule)
+
+    def _sleep(self, seconds):
+        if self.time_scale > 0 and seconds > 0:
+            time.sleep(seconds * self.time_scale)
+
+    def _readings(self, times):
+        if self.digitize_function:
+            # Noise of an integration over the aperture, as if it were that many power line cycles
+            aperture = self.aperture.get(self.digitize_function, 'auto')
+            aperture = self.reading_time() if aperture == 'auto' else aperture
+            sigma = self.noise / math.sqrt(aperture * self.line_frequency)
+        else:
+            sigma = self.noise / math.sqrt(self.nplc.get(self.function, 1.0))
+        return self.waveform(times) + self._rng.normal(0.0, sigma, len(times))
+
+    # Generate the buffered readings the running trigger model has taken by now
+    def _fill_buffer(self):
+        if self._trigger_start is None:
+            return
+        if self.time_scale > 0:
+            elapsed = (time.monotonic() - self._trigger_start) / self.time_scale
+            taken = int(np.searchsorted(self._schedule, elapsed, 'right'))
+        else:
+            taken = self._trigger_count
+        taken = min(taken, self._trigger_count)
+        done = len(self._buffer_times)
+        if taken > done:
+            rel = self._schedule[done:taken]
+            start = (self._trigger_start - self._epoch) / (self.time_scale or 1.0)
+            values = self._readings(start + rel) + self._schedule_offsets[done:taken]
+            self._buffer_times = np.concatenate([self._buffer_times, rel])
+            self._buffer_values = np.concatenate([self._buffer_values, values])
+        if taken >= self._trigger_count:
+            self._trigger_start = None
+            self._trigger_state = 'IDLE'
+
+    def _buffer_range(self, args):
+        start, end = int(args[0]), int(args[1])
+        self._fill_buffer()
+        if not 1 <= start <= end <= len(self._buffer_times):
+            self.errors.append(PARAMETER_OUT_OF_RANGE)
+            return np.empty(0)
+        rel = self._buffer_times[start - 1:end]
+        values = self._buffer_values[start - 1:end]
+        return np.column_stack([rel, values]).ravel()  # Interleaved REL, READ
+
+    # Channel numbers of a SCPI channel list such as (@1:3,7)
+    @staticmethod
+    def _channels(text):
+        channels = []
+        for part in text.strip().strip('(@)').split(','):
+            first, _, last = part.partition(':')
+            channels.extend(range(int(first), int(last or first) + 1))
+        return channels
+
+    # Handle one SCPI command without a response
+    def _write_one(self, cmd):
+        header, _, arg = cmd.strip().partition(' ')
+        header = header.upper()
+        arg = arg.strip()
+        sense = re.fullmatch(r':SENS:(.+):(NPLC|AZER|RANG|RANG:AUTO|SRAT|APER)', header)
+        channel_list = re.search(r',\s*(\(@[\d:,]+\))$', arg)  # Setting of scanner channels instead of the front inputs
+        if channel_list:
+            channels = self._channels(channel_list.group(1))
+            arg = arg[:channel_list.start()].strip()
+            if header == ':SENS:FUNC':
+                self.channel_function.update((c, arg.strip('"')) for c in channels)
+            elif sense and sense.group(2) == 'NPLC':
+                self.channel_nplc.update((c, float(arg)) for c in channels)
+            elif sense:
+                self.channel_range.update((c, arg) for c in channels)
+            else:
+                self.errors.append(UNDEFINED_HEADER)
+        elif header == '*RST':
+            self.reset()
+        elif header == ':ROUT:SCAN:CRE':
+            self.scan_list = self._channels(arg)
+            self._scan_loaded = True
+        elif header == ':ROUT:SCAN:COUN:SCAN':
+            self.scan_count = int(arg)
+        elif header == ':ROUT:SCAN:INT':
+            self.scan_interval = float(arg)
+        elif header == ':SENS:FUNC':
+            self.function = arg.strip('"')
+            self.digitize_function = None
+        elif header == ':SENS:DIG:FUNC':
+            self.digitize_function = 'DIG:' + arg.strip('"').upper()
+        elif header == ':SENS:DIG:COUN':
+            self.digitize_count = int(arg)
+        elif sense:
+            function, setting = sense.groups()
+            if setting == 'SRAT':
+                if not 1000 <= float(arg) <= 1000000:
+                    self.errors.append(PARAMETER_OUT_OF_RANGE)
+                    return
+                self.sample_rate[function] = float(arg)
+            elif setting == 'APER':
+                self.aperture[function] = 'auto' if arg.upper() == 'AUTO' else float(arg)
+            elif setting == 'NPLC':
+                if not 0.0005 <= float(arg) <= 12.0:
+                    self.errors.append(PARAMETER_OUT_OF_RANGE)
+                    return
+                self.nplc[function] = float(arg)
+            elif setting == 'AZER':
+                self.auto_zero[function] = arg.upper() in {'ON', '1'}
+            elif setting == 'RANG':
+                self.range[function] = float(arg)
+            else:
+                self.range[function] = 'auto'
+        elif header in {':SYST:CLEAR', ':DISP:CLEAR', ':DISP:SCREEN'} or header.startswith(':DISP:USER'):
+            pass
+        elif header == ':TRAC:CLE':
+            self._buffer_times = np.empty(0)
+            self._buffer_values = np.empty(0)
+        elif header == ':TRAC:POIN':
+            self.buffer_capacity = int(arg.split(',')[0])
+        elif header == ':TRIG:LOAD':
+            fields = [f.strip() for f in arg.split(',')]
+            self._loop_count = self._trigger_count = int(fields[1])
+            self._trigger_delay = float(fields[2]) if len(fields) > 2 else 0.0
+            self._scan_loaded = False
+        elif header == ':INIT':
+            self._build_schedule()
+            self._trigger_start = time.monotonic()
+            self._trigger_state = 'RUNNING'
+        elif header == ':ABOR':
+            self._fill_buffer()
+            self._trigger_start = None
+            self._trigger_state = 'IDLE' if self._trigger_state == 'IDLE' else 'ABORTED'
+        elif header == ':FORM:DATA':
+            self.data_format = arg.upper()
+        elif header == ':FORM:BORD':
+            self.byte_order = arg.upper()
+        else:
+            self.errors.append(UNDEFINED_HEADER)
+
+    # Handle one SCPI query and return its response text
+    def _query_one(self, cmd):
+        header, _, arg = cmd.strip().partition(' ')
+        header = header.upper()
+        if header == '*IDN?':
+            return f'KEITHLEY INSTRUMENTS,MODEL DMM6500,{self.serial},1.7.12b'
+        elif header == ':MEAS?':
+            self._sleep(self.reading_time())
+            t = (time.monotonic() - self._epoch) / (self.time_scale or 1.0)
+            return f'{self._readings(np.array([t]))[0]:.9E}'
+        elif header == ':SYST:ERR:NEXT?':
+            code, message = self.errors.pop(0) if self.errors else (0, 'No error')
+            return f'{code},"{message}"'
+        elif header == ':SYST:ERR:COUN?':
+            return str(len(self.errors))
+        elif header == ':SYST:LFR?':
+            return f'{self.line_frequency:g}'
+        elif header == ':TRIG:STAT?':
+            self._fill_buffer()
+            return f'{self._trigger_state};{self._trigger_state};{len(self._buffer_times)}'
+        elif header == ':TRAC:ACT?':
+            self._fill_buffer()
+            return str(len(self._buffer_times))
+        elif header == ':TRAC:DATA?':
+            return ','.join(f'{v:.9E}' for v in self._buffer_range(arg.split(',')))
+        self.errors.append(UNDEFINED_HEADER)
+        return ''
+
+    # Split a semicolon-separated message into commands, ignoring semicolons inside quotes
+    @staticmethod
+    def _split(message):
+        return [c for c in re.split(r';(?=(?:[^"]*"[^"]*")*[^"]*$)', message) if c.strip()]
+
+    # Raise a timeout like a VISA transfer on a broken link does
+    def _transfer(self):
+        if not self.online or (self.fault_rate and self._fault_rng.random() < self.fault_rate):
+            self._sleep(self.timeout / 1000)
+            raise TimeoutError('VI_ERROR_TMO (-1073807339): Timeout expired before operation completed.')
+
+    def write(self, message):
+        self._transfer()
+        self.write_count += 1
+        self._sleep(self.latency / 2)  # One-way transfer
+        for cmd in self._split(message):
+            self._write_one(cmd)
+
+    def query(self, message):
+        self._transfer()
+        self.query_count += 1
+        self._sleep(self.latency)
+        responses = []
+        for cmd in self._split(message):
+            if cmd.strip().endswith('?') or '? ' in cmd:
+                responses.append(self._query_one(cmd))
+            else:
+                self._write_one(cmd)
+        return ';'.join(responses) + '\n'
+
+    # Binary buffer transfer, mirroring pyvisa's query_binary_values for :TRAC:DATA?
+    def query_binary_values(self, message, datatype='f', is_big_endian=False, container=list):
+        self._transfer()
+        self.query_count += 1
+        header, _, arg = message.strip().partition(' ')
+        values = self._buffer_range(arg.split(','))
+        self._sleep(self.latency + values.nbytes / 4e6)  # Round trip plus transfer at about 4 MB/s
+        return container(values.astype(np.float32 if datatype == 'f' else np.float64))
+
+    def close(self):
+        pass
@@ -0,0 +1,164 @@
+# Import necessary libraries and modules
+import math  # Import math for the standard deviation
+import numpy as np  # Import NumPy for vectorized chunk statistics and decimation
+from dmm6500_writer import format_timestamp  # Import the timestamp formatting used by the CSV files
+
+# Header of the summary rows emitted by the statistics stage
+SUMMARY_HEADER = ['Timestamp', 'Count', 'Mean', 'Min', 'Max', 'StdDev']
+
+
+# Welford-style running mean/variance with min and max; chunks are merged with Chan's parallel update
+class RunningStats:
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # Sum of squared deviations from the mean
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    # Merge a whole array of readings at once
+    def update_array(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        n = len(values)
+        if n == 0:
+            return
+        mean = float(values.mean())
+        m2 = float(((values - mean) ** 2).sum())
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta * delta * self.count * n / total
+        self.count = total
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    @property
+    def stddev(self):
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    # (count, mean, min, max, standard deviation)
+    def summary(self):
+        return self.count, self.mean, self.min, self.max, self.stddev
+
+
+# Aggregates readings into fixed, wall-clock aligned time windows and returns a summary row for each closed window
+class WindowAggregator:
+    def __init__(self, window):
+        self.window = window  # Window length (in seconds)
+        self.current = None  # Index of the window being filled
+        self.stats = RunningStats()
+
+    # Add readings in time order; returns rows (window start, count, mean, min, max, stddev) of windows that closed
+    def add(self, times, values):
+        rows = []
+        index = np.floor(np.asarray(times) / self.window).astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, index[1:] != index[:-1]])
+        ends = np.r_[starts[1:], len(index)]
+        for start, end in zip(starts, ends):
+            if self.current is not None and index[start] != self.current:
+                rows.append(self._close())
+            self.current = index[start]
+            self.stats.update_array(values[start:end])
+        return rows
+
+    def _close(self):
+        row = (float(self.current * self.window),) + self.stats.summary()
+        self.stats = RunningStats()
+        return row
+
+    # Close the partially filled window, e.g. at the end of a run
+    def flush(self):
+        rows = [self._close()] if self.current is not None and self.stats.count else []
+        self.current = None
+        return rows
+
+
+# Downsamples by keeping the minimum and maximum (in time order) of every block of `factor` readings,
+# so spikes survive decimation; the output has 2 readings per block
+class MinMaxDecimator:
+    def __init__(self, factor):
+        if factor < 2:
+            raise ValueError('decimation factor must be at least 2')
+        self.factor = factor
+        self._times = np.empty(0)  # Readings left over from the previous chunk
+        self._values = np.empty(0)
+
+    # Add readings; returns the decimated (time, value) readings of every completed block as an (n, 2) array
+    def add(self, times, values):
+        times = np.concatenate([self._times, times])
+        values = np.concatenate([self._values, values])
+        n = len(values) // self.factor * self.factor
+        self._times, self._values = times[n:], values[n:]
+        return self._decimate(times[:n].reshape(-1, self.factor), values[:n].reshape(-1, self.factor))
+
+    @staticmethod
+    def _decimate(times, values):
+        rows = np.arange(len(values))
+        imin = values.argmin(axis=1)
+        imax = values.argmax(axis=1)
+        first = np.minimum(imin, imax)
+        second = np.maximum(imin, imax)
+        out_times = np.column_stack([times[rows, first], times[rows, second]]).ravel()
+        out_values = np.column_stack([values[rows, first], values[rows, second]]).ravel()
+        return np.column_stack([out_times, out_values])
+
+    # Decimate the incomplete last block, e.g. at the end of a run
+    def flush(self):
+        if not len(self._values):
+            return np.empty((0, 2))
+        result = self._decimate(self._times.reshape(1, -1), self._values.reshape(1, -1))
+        self._times, self._values = np.empty(0), np.empty(0)
+        return result
+
+
+# Pipeline stage computing running statistics, windowed summary rows and a min/max decimated trace.
+# Items are (readings, slots) like the other sinks; summary rows go to summary_writer (a CSV writer with
+# SUMMARY_HEADER) and the decimated trace to trace_writer (any sink with write_readings()).
+class StatsStage:
+    def __init__(self, window=None, summary_writer=None, decimation=None, trace_writer=None):
+        self.total = RunningStats()  # Statistics of the whole run
+        self.windows = WindowAggregator(window) if window else None
+        self.summary_writer = summary_writer
+        self.decimator = MinMaxDecimator(decimation) if decimation else None
+        self.trace_writer = trace_writer
+
+    def __call__(self, item):
+        block = np.asarray(item[0], dtype=np.float64).reshape(-1, 2)
+        block = block[~np.isnan(block[:, 1])]  # Leave out gap markers (NaN readings)
+        if not len(block):
+            return
+        times, values = block[:, 0], block[:, 1]
+        self.total.update_array(values)
+        if self.windows is not None:
+            self._write_summary(self.windows.add(times, values))
+        if self.decimator is not None:
+            self._write_trace(self.decimator.add(times, values))
+
+    def _write_summary(self, rows):
+        if rows and self.summary_writer is not None:
+            self.summary_writer.write_rows([format_timestamp(row[0]), *row[1:]] for row in rows)
+
+    def _write_trace(self, readings):
+        if len(readings) and self.trace_writer is not None:
+            self.trace_writer.write_readings(readings)
+
+    # Emit the partially filled window and block; call before closing the writers
+    def close(self):
+        if self.windows is not None:
+            self._write_summary(self.windows.flush())
+        if self.decimator is not None:
+            self._write_trace(self.decimator.flush())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
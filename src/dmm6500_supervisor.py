@@ -0,0 +1,127 @@
+# Import necessary libraries and modules
+import threading  # Import threading for serializing reconnect attempts
+import time  # Import time module for reconnect backoff
+from dmm6500_scpi import CommandBatch, SettingsCache  # Import the settings mirror replayed after reconnecting
+
+# Reconnect backoff: the wait before the next attempt doubles after every failed attempt, up to RECONNECT_MAX_DELAY
+RECONNECT_DELAY = 0.5  # Wait before the first reconnect attempt (in seconds)
+RECONNECT_MAX_DELAY = 30.0  # Longest wait between reconnect attempts (in seconds)
+
+# Value written in place of a reading that could not be taken, so gaps stay visible on the sample timeline
+GAP = float('nan')
+
+
+# Raised by a SupervisedResource while its instrument is unreachable
+class ConnectionLost(ConnectionError):
+    pass
+
+
+# Resource wrapper that survives transport faults. A failing write or query (VISA timeout, USB or LAN error)
+# closes the resource and raises ConnectionLost; later calls reopen it with exponential backoff and then
+# re-apply the settings recorded in `cache`. Calls between attempts fail right away instead of blocking,
+# so an interval schedule keeps its timeline while the instrument is away.
+# `connect` is a callable returning a freshly opened resource, or None if the instrument can't be reached.
+class SupervisedResource:
+    def __init__(self, connect, resource=None, cache=None, delay=RECONNECT_DELAY, max_delay=RECONNECT_MAX_DELAY):
+        self.connect = connect
+        self.cache = SettingsCache() if cache is None else cache  # Pass it to apply_settings() to have settings restored
+        self.delay = delay
+        self.max_delay = max_delay
+        self.disconnects = 0
+        self.reconnects = 0
+        self.failed_attempts = 0
+        self.downtime = 0.0  # Total time spent disconnected (in seconds)
+        self._resource = resource if resource is not None else connect()
+        if self._resource is None:
+            raise ConnectionLost('instrument not reachable')
+        self.resource_name = self._resource.resource_name
+        self._lost_at = None
+        self._backoff = delay
+        self._next_attempt = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def connected(self):
+        return self._resource is not None
+
+    def _lost(self, error):
+        print(f"Connection to {self.resource_name} lost: {error}")
+        try:
+            self._resource.close()
+        except Exception:
+            pass  # The transport is already broken
+        self._resource = None
+        self._lost_at = time.monotonic()
+        self._backoff = self.delay
+        self._next_attempt = self._lost_at + self.delay
+        self.disconnects += 1
+
+    # Try to reopen the resource if the backoff allows; returns whether the instrument is connected
+    def reconnect(self):
+        with self._lock:
+            if self._resource is not None:
+                return True
+            now = time.monotonic()
+            if now < self._next_attempt:
+                return False
+            try:
+                resource = self.connect()
+                if resource is not None:
+                    self._restore(resource)
+            except Exception as e:
+                print(f"Reconnecting to {self.resource_name} failed: {e}")
+                resource = None
+            if resource is None:
+                self.failed_attempts += 1
+                self._backoff = min(self._backoff * 2, self.max_delay)
+                self._next_attempt = time.monotonic() + self._backoff
+                return False
+            self._resource = resource
+            down = time.monotonic() - self._lost_at
+            self.downtime += down
+            self.reconnects += 1
+            print(f"Reconnected to {self.resource_name} after {down:.1f} s")
+            return True
+
+    # Re-apply the mirrored settings to a freshly opened resource in as few transfers as possible
+    def _restore(self, resource):
+        batch = CommandBatch(resource)
+        batch.add_commands(self.cache.commands())
+        batch.send(check_errors=False)
+
+    # Block until the instrument is back, e.g. before restarting a burst; gives up after `timeout` seconds
+    def wait_connected(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.reconnect():
+            wait = max(self._next_attempt - time.monotonic(), 0.01)
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+        return True
+
+    def _call(self, method, *args, **kwargs):
+        if self._resource is None and not self.reconnect():
+            raise ConnectionLost(f'{self.resource_name} is disconnected')
+        try:
+            return getattr(self._resource, method)(*args, **kwargs)
+        except Exception as e:
+            self._lost(e)
+            raise ConnectionLost(str(e)) from e
+
+    def write(self, message):
+        return self._call('write', message)
+
+    def query(self, message):
+        return self._call('query', message)
+
+    def query_binary_values(self, message, **kwargs):
+        return self._call('query_binary_values', message, **kwargs)
+
+    def close(self):
+        if self._resource is not None:
+            self._resource.close()
+            self._resource = None
+
+    def summary(self):
+        return (f"{self.disconnects} disconnects, {self.reconnects} reconnects, "
+                f"{self.failed_attempts} failed attempts, {self.downtime:.1f} s down")
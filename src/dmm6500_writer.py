@@ -0,0 +1,262 @@
+# Import necessary libraries and modules
+import csv  # Import CSV module for writing CSV files
+import os  # Import os for fsync and file name handling
+import threading  # Import threading for flushing on a timer while no rows arrive
+import time  # Import time module for flush interval bookkeeping
+from datetime import datetime  # Import datetime for sub-second timestamp formatting
+import numpy as np  # Import NumPy for the columnar sinks
+import dmm6500_metrics  # Import the opt-in latency metrics
+
+# Default flush policy for streaming writers
+FLUSH_ROWS = 1000  # Flush buffered rows once this many have accumulated
+FLUSH_INTERVAL = 1.0  # Flush buffered rows at least this often (in seconds)
+FSYNC_INTERVAL = 30.0  # Force flushed data to disk at least this often (in seconds)
+
+ROW_GROUP_ROWS = 100000  # Rows per chunk (Parquet row group, HDF5 chunk) for the columnar sinks
+
+# Record layout of the append-only memmap sink: epoch time and reading, both little-endian float64
+READING_DTYPE = np.dtype([('time', '<f8'), ('value', '<f8')])
+
+
+# Function to format an epoch timestamp with sub-second resolution
+def format_timestamp(t):
+    return datetime.fromtimestamp(t).strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+# CSV writer that keeps the file open and batches rows in memory. A background timer flushes (and fsyncs) rows
+# that would otherwise wait for the next row, e.g. while acquisition is stalled waiting for a reconnect.
+class StreamingCSVWriter:
+    def __init__(self, filename, header=None, append=False, flush_rows=FLUSH_ROWS,
+                 flush_interval=FLUSH_INTERVAL, fsync_interval=FSYNC_INTERVAL):
+        self.filename = filename
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.rows_written = 0  # Rows handed to the operating system so far
+        self._pending = []  # Rows waiting for the next flush
+        self._file = open(filename, 'a' if append else 'w', newline='')
+        self._writer = csv.writer(self._file)
+        self._last_flush = self._last_fsync = time.monotonic()
+        self._lock = threading.RLock()  # The timer flushes from its own thread
+        self._closing = threading.Event()
+        if header is not None and not append:
+            self._writer.writerow(header)
+            self.checkpoint()
+        self._timer = threading.Thread(target=self._flush_on_timer, name=f'flush {filename}', daemon=True)
+        self._timer.start()
+
+    # Queue a single row, flushing if the row count or time interval is reached
+    def write_row(self, row):
+        with self._lock:
+            self._pending.append(row)
+            self._maybe_flush()
+
+    # Queue many rows at once (e.g. a chunk of buffered readings)
+    def write_rows(self, rows):
+        with self._lock:
+            self._pending.extend(rows)
+            self._maybe_flush()
+
+    def _maybe_flush(self):
+        now = time.monotonic()
+        if len(self._pending) >= self.flush_rows or now - self._last_flush >= self.flush_interval:
+            self.flush()
+            if now - self._last_fsync >= self.fsync_interval:
+                self.checkpoint()
+
+    def _flush_on_timer(self):
+        while not self._closing.wait(self.flush_interval):
+            with self._lock:
+                if self._file.closed:
+                    return
+                self._maybe_flush()
+
+    # Queue (epoch time, value) readings, formatting the timestamps as text
+    def write_readings(self, readings):
+        self.write_rows([format_timestamp(t), value] for t, value in readings)
+
+    # Write all pending rows and hand them to the operating system
+    def flush(self):
+        with self._lock:
+            start = time.perf_counter()
+            if self._pending:
+                self._writer.writerows(self._pending)
+                self.rows_written += len(self._pending)
+                self._pending.clear()
+            self._file.flush()
+            self._last_flush = time.monotonic()
+            if dmm6500_metrics.active is not None:
+                dmm6500_metrics.active.record('disk', type(self).__name__, time.perf_counter() - start)
+
+    # Flush and force the data onto the storage device
+    def checkpoint(self):
+        with self._lock:
+            self.flush()
+            os.fsync(self._file.fileno())
+            self._last_fsync = time.monotonic()
+
+    def close(self):
+        self._closing.set()
+        self._timer.join()
+        with self._lock:
+            if not self._file.closed:
+                self.checkpoint()
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+# Base class of the columnar sinks: readings are collected into arrays and written in large blocks
+class _ColumnarWriter:
+    def __init__(self, filename, column, flush_rows=ROW_GROUP_ROWS, flush_interval=FSYNC_INTERVAL):
+        self.filename = filename
+        self.column = column  # Name of the value column, e.g. 'Voltage'
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.rows_written = 0
+        self._pending = []  # (n, 2) float64 blocks waiting for the next flush
+        self._pending_rows = 0
+        self._last_flush = time.monotonic()
+        self._closed = False
+
+    # Queue (epoch time, value) readings given as pairs or as an (n, 2) array
+    def write_readings(self, readings):
+        block = np.asarray(readings, dtype=np.float64).reshape(-1, 2)
+        self._pending.append(block)
+        self._pending_rows += len(block)
+        if self._pending_rows >= self.flush_rows or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if self._pending_rows:
+            start = time.perf_counter()
+            block = np.concatenate(self._pending)
+            self._write_block(block[:, 0], block[:, 1])
+            self.rows_written += len(block)
+            self._pending.clear()
+            self._pending_rows = 0
+            if dmm6500_metrics.active is not None:
+                dmm6500_metrics.active.record('disk', type(self).__name__, time.perf_counter() - start)
+        self._last_flush = time.monotonic()
+
+    def checkpoint(self):
+        self.flush()
+
+    def close(self):
+        if not self._closed:
+            self.flush()
+            self._close()
+            self._closed = True
+
+    def _write_block(self, times, values):
+        raise NotImplementedError
+
+    def _close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+# Parquet sink: one compressed row group per block, with microsecond timestamps (needs pyarrow)
+class ParquetWriter(_ColumnarWriter):
+    def __init__(self, filename, column, compression='zstd', **kwargs):
+        super().__init__(filename, column, **kwargs)
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError('The Parquet sink needs pyarrow (pip install pyarrow)')
+        self._pa = pa
+        self._schema = pa.schema([('Timestamp', pa.timestamp('us', tz='UTC')), (column, pa.float64())])
+        self._writer = pq.ParquetWriter(filename, self._schema, compression=compression)
+
+    def _write_block(self, times, values):
+        pa = self._pa
+        timestamps = pa.array(np.round(times * 1e6).astype('datetime64[us]'), type=pa.timestamp('us', tz='UTC'))
+        table = pa.Table.from_arrays([timestamps, pa.array(values)], schema=self._schema)
+        self._writer.write_table(table)
+
+    def _close(self):
+        self._writer.close()
+
+
+# HDF5 sink: resizable, chunked and compressed 'time' and value datasets (needs h5py)
+class HDF5Writer(_ColumnarWriter):
+    def __init__(self, filename, column, compression='gzip', **kwargs):
+        super().__init__(filename, column, **kwargs)
+        try:
+            import h5py
+        except ImportError:
+            raise ImportError('The HDF5 sink needs h5py (pip install h5py)')
+        self._file = h5py.File(filename, 'w')
+        chunks = (min(self.flush_rows, ROW_GROUP_ROWS),)
+        self._times = self._file.create_dataset('time', shape=(0,), maxshape=(None,), dtype='f8',
+                                                chunks=chunks, compression=compression)
+        self._values = self._file.create_dataset(column, shape=(0,), maxshape=(None,), dtype='f8',
+                                                 chunks=chunks, compression=compression)
+        self._times.attrs['units'] = 'seconds since the epoch'
+
+    def _write_block(self, times, values):
+        start = self._times.shape[0]
+        for dataset, data in ((self._times, times), (self._values, values)):
+            dataset.resize((start + len(data),))
+            dataset[start:] = data
+        self._file.flush()
+
+    def _close(self):
+        self._file.close()
+
+
+# Append-only raw sink of READING_DTYPE records, readable with np.memmap(filename, dtype=READING_DTYPE)
+class MemmapWriter(_ColumnarWriter):
+    def __init__(self, filename, column, append=False, **kwargs):
+        super().__init__(filename, column, **kwargs)
+        self._file = open(filename, 'ab' if append else 'wb')
+
+    def _write_block(self, times, values):
+        records = np.empty(len(times), dtype=READING_DTYPE)
+        records['time'] = times
+        records['value'] = values
+        records.tofile(self._file)
+        self._file.flush()
+
+    def checkpoint(self):
+        self.flush()
+        os.fsync(self._file.fileno())
+
+    def _close(self):
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+
+# Output sinks by name, with the file extension each one uses
+SINKS = {
+    'csv': (StreamingCSVWriter, '.csv'),
+    'parquet': (ParquetWriter, '.parquet'),
+    'hdf5': (HDF5Writer, '.h5'),
+    'memmap': (MemmapWriter, '.f8'),
+}
+
+
+# Function to derive the file name of a sink from the base output file name
+def sink_filename(filename, kind):
+    if kind == 'csv':
+        return filename
+    return os.path.splitext(filename)[0] + SINKS[kind][1]
+
+
+# Function to open an output sink by name; every sink has write_readings(), checkpoint() and close()
+def open_sink(kind, filename, column):
+    if kind not in SINKS:
+        raise ValueError(f'Unknown output sink {kind!r}, expected one of {", ".join(SINKS)}')
+    if kind == 'csv':
+        return StreamingCSVWriter(filename, header=['Timestamp', column])
+    return SINKS[kind][0](filename, column)